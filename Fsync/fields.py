@@ -0,0 +1,48 @@
+import json
+
+from django.db import models
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+
+class _OrjsonEncoder(json.JSONEncoder):
+    """json.JSONEncoder interface backed by orjson (used via json.dumps(cls=...))"""
+
+    def encode(self, o):
+        return orjson.dumps(o, option=orjson.OPT_NON_STR_KEYS).decode('utf-8')
+
+
+class _OrjsonDecoder(json.JSONDecoder):
+    """json.JSONDecoder interface backed by orjson (used via json.loads(cls=...))"""
+
+    def decode(self, s, _w=None):
+        # orjson.JSONDecodeError subclasses json.JSONDecodeError, which
+        # JSONField.from_db_value already handles
+        return orjson.loads(s)
+
+
+class OrjsonJSONField(models.JSONField):
+    """
+    JSONField that encodes and decodes column values with orjson when it is
+    installed, and behaves exactly like models.JSONField otherwise.
+
+    The database column is unchanged, so the field deconstructs as a plain
+    JSONField and needs no migration.
+    """
+
+    def __init__(self, *args, **kwargs):
+        if orjson is not None:
+            kwargs.setdefault('encoder', _OrjsonEncoder)
+            kwargs.setdefault('decoder', _OrjsonDecoder)
+        super().__init__(*args, **kwargs)
+
+    def deconstruct(self):
+        name, path, args, kwargs = super().deconstruct()
+        if kwargs.get('encoder') is _OrjsonEncoder:
+            del kwargs['encoder']
+        if kwargs.get('decoder') is _OrjsonDecoder:
+            del kwargs['decoder']
+        return name, 'django.db.models.JSONField', args, kwargs
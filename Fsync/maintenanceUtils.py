@@ -1,12 +1,9 @@
 from celery import shared_task
 from django.utils import timezone
-from datetime import timedelta
+from django.db import connection, transaction
+from datetime import datetime, timedelta
 import logging
-import traceback
-from .models import SyncLog, SyncQueue
-from .syncManager import FHIRSyncService
-from  .tasksUtils import validate_fhir_data
-from django.db.models import Count
+from .models import SyncLog, SyncQueue, FHIRSyncConfig
 logger = logging.getLogger(__name__)
 
 
@@ -19,42 +16,232 @@ def cleanup_sync_tasks():
     """
     Clean up old sync logs and completed queue items to prevent database bloat.
     This maintenance task:
-    1. Removes successful sync logs older than 30 days
-    2. Removes successful queue items older than 7 days
+    1. Removes INFO/DEBUG sync logs older than the log retention window (30 days by default),
+       dropping whole monthly partitions where possible
+    2. Removes successful queue items older than the queue retention window (7 days by default)
     3. Preserves error logs for troubleshooting
+    4. Resets stuck processing items and removes duplicates
+    Retention windows are read from the active 'default' FHIRSyncConfig.
     Returns:
     dict: Cleanup statistics
     """
     try:
         # Define cleanup thresholds
-        cutoff_date = timezone.now() - timedelta(seconds=300)  # 5 minutes for logs
+        config = FHIRSyncConfig.objects.filter(name='default', is_active=True).first()
+        log_retention_days = config.log_retention_days if config else 30
+        queue_retention_days = config.queue_retention_days if config else 7
+        now = timezone.now()
         
-        # Clean up successful sync logs older than 30 days
+        log_cutoff = now - timedelta(days=log_retention_days)
+        
+        # Drop whole monthly log partitions that are past the retention window
+        partitions_dropped = drop_expired_synclog_partitions(log_cutoff)
+        
+        # Clean up successful sync logs past the log retention window
+        # (rows in the partially expired month and the default partition)
         # Keep INFO and DEBUG level logs for historical reference
         deleted_logs = SyncLog.objects.filter(
-            timestamp__lt=cutoff_date,
+            timestamp__lt=log_cutoff,
             level__in=['INFO', 'DEBUG']  # Don't delete ERROR or WARNING logs
         ).delete()
         
-        # Clean up successful queue items older than 7 days
+        # Clean up successful queue items past the queue retention window
         # Successful items don't need long-term retention
         # Use 'created_at' instead of 'timestamp' for SyncQueue model
         deleted_queue = SyncQueue.objects.filter(
-            created_at__lt=cutoff_date,
+            created_at__lt=now - timedelta(days=queue_retention_days),
             status='success'  # Only delete successful items
         ).delete()
         
+        # Then reset stuck items and remove duplicates
+        stuck_cleanup = cleanup_stuck_processing_items()
+        
         logger.info(f"Cleanup completed: {deleted_logs[0]} logs, {deleted_queue[0]} queue items")
         return {
             'logs_deleted': deleted_logs[0],
-            'queue_items_deleted': deleted_queue[0]
+            'queue_items_deleted': deleted_queue[0],
+            'log_partitions_dropped': partitions_dropped,
+            'stuck_cleanup': stuck_cleanup
         }
     except Exception as e:
-        logger.error(f"Cleanup task failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"Cleanup task failed: {e}")
         return {'error': str(e)}
 
 
+# ============================================================================
+# SYNC LOG PARTITIONS (PostgreSQL)
+# ============================================================================
+# SyncLog is range-partitioned by month on "timestamp" (migration 0004).
+# Partitions are named "<table>_pYYYYMM"; rows outside them land in
+# "<table>_default".
+
+def _month_start(d):
+    return d.replace(day=1)
+
+
+def _next_month(d):
+    return (d.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _synclog_partitions(cursor):
+    """Return {month_start: partition_name} for the monthly SyncLog partitions"""
+    table = SyncLog._meta.db_table
+    cursor.execute(
+        """
+        SELECT child.relname
+        FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE parent.relname = %s
+        """,
+        [table]
+    )
+    prefix = f"{table}_p"
+    partitions = {}
+    for (name,) in cursor.fetchall():
+        if not name.startswith(prefix):
+            continue
+        try:
+            month = datetime.strptime(name[len(prefix):], '%Y%m').date()
+        except ValueError:
+            continue
+        partitions[month] = name
+    return partitions
+
+
+def _synclog_is_partitioned(cursor):
+    cursor.execute(
+        """
+        SELECT 1 FROM pg_partitioned_table
+        JOIN pg_class ON pg_class.oid = pg_partitioned_table.partrelid
+        WHERE pg_class.relname = %s
+        """,
+        [SyncLog._meta.db_table]
+    )
+    return cursor.fetchone() is not None
+
+
+@shared_task
+def ensure_synclog_partitions(months_ahead=2):
+    """
+    Create the monthly SyncLog partitions for the current month and the
+    next 'months_ahead' months, so new logs never pile up in the default partition.
+    
+    Returns:
+        dict: Names of the partitions created
+    """
+    if connection.vendor != 'postgresql':
+        return {'skipped': 'SyncLog partitioning requires PostgreSQL'}
+    
+    table = SyncLog._meta.db_table
+    created = []
+    try:
+        with connection.cursor() as cursor:
+            if not _synclog_is_partitioned(cursor):
+                return {'skipped': f'{table} is not partitioned'}
+            
+            existing = _synclog_partitions(cursor)
+            month = _month_start(timezone.now().date())
+            for _ in range(months_ahead + 1):
+                if month not in existing:
+                    name = f"{table}_p{month:%Y%m}"
+                    with transaction.atomic():
+                        _create_synclog_partition(cursor, name, month)
+                    created.append(name)
+                month = _next_month(month)
+        
+        if created:
+            logger.info(f"Created SyncLog partitions: {', '.join(created)}")
+        return {'created': created}
+    except Exception as e:
+        logger.exception(
+            f"Failed to create SyncLog partitions: {e}. New logs keep landing in "
+            f'"{table}_default" until the missing months are partitioned; run '
+            f"ensure_synclog_partitions again once the cause is fixed"
+        )
+        return {'error': str(e), 'created': created}
+
+
+def _create_synclog_partition(cursor, name, month):
+    """
+    Create the SyncLog partition for 'month'. Must run inside a transaction.
+    
+    Rows of that month already in the default partition would make
+    CREATE TABLE ... PARTITION OF fail, so the default partition is detached
+    while the partition is created and those rows are moved into it.
+    """
+    table = SyncLog._meta.db_table
+    default = f"{table}_default"
+    lower = f"{month:%Y-%m-%d}"
+    upper = f"{_next_month(month):%Y-%m-%d}"
+    
+    cursor.execute(
+        f'SELECT EXISTS (SELECT 1 FROM "{default}" WHERE "timestamp" >= %s AND "timestamp" < %s)',
+        [lower, upper]
+    )
+    if not cursor.fetchone()[0]:
+        cursor.execute(
+            f'CREATE TABLE IF NOT EXISTS "{name}" PARTITION OF "{table}" '
+            f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+        )
+        return
+    
+    columns = '"id", "level", "message", "details", "timestamp", "queue_item_id"'
+    cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{default}"')
+    cursor.execute(
+        f'CREATE TABLE "{name}" PARTITION OF "{table}" '
+        f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    )
+    cursor.execute(
+        f'INSERT INTO "{name}" ({columns}) '
+        f'SELECT {columns} FROM "{default}" WHERE "timestamp" >= %s AND "timestamp" < %s',
+        [lower, upper]
+    )
+    cursor.execute(
+        f'DELETE FROM "{default}" WHERE "timestamp" >= %s AND "timestamp" < %s',
+        [lower, upper]
+    )
+    cursor.execute(f'ALTER TABLE "{table}" ATTACH PARTITION "{default}" DEFAULT')
+    logger.info(f"Moved {month:%Y-%m} SyncLog rows from {default} into {name}")
+
+
+def drop_expired_synclog_partitions(cutoff):
+    """
+    Drop monthly SyncLog partitions that lie entirely before 'cutoff'.
+    
+    Dropping a partition is a metadata operation, unlike a DELETE scan.
+    WARNING/ERROR rows are kept: they are copied back into the parent table
+    (landing in the default partition) after the month is detached.
+    
+    Returns:
+        int: Number of partitions dropped (0 on non-PostgreSQL backends)
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    
+    table = SyncLog._meta.db_table
+    columns = '"id", "level", "message", "details", "timestamp", "queue_item_id"'
+    dropped = 0
+    with connection.cursor() as cursor:
+        if not _synclog_is_partitioned(cursor):
+            return 0
+        
+        for month, name in sorted(_synclog_partitions(cursor).items()):
+            if _next_month(month) > cutoff.date():
+                continue
+            with transaction.atomic():
+                cursor.execute(f'ALTER TABLE "{table}" DETACH PARTITION "{name}"')
+                cursor.execute(
+                    f'INSERT INTO "{table}" ({columns}) '
+                    f'SELECT {columns} FROM "{name}" WHERE "level" IN (%s, %s)',
+                    ['WARNING', 'ERROR']
+                )
+                cursor.execute(f'DROP TABLE "{name}"')
+            dropped += 1
+            logger.info(f"Dropped expired SyncLog partition {name}")
+    return dropped
+
+
 @shared_task
 def sync_single_resource_task(resource_type, resource_id, operation='create'):
     """
@@ -73,18 +260,27 @@ def sync_single_resource_task(resource_type, resource_id, operation='create'):
     Returns:
         dict: Sync result with status and FHIR ID
     """
+    # Imported here so worker start-up does not load the sync/mapping stack
+    from .syncManager import FHIRSyncService
+    from .tasksUtils import validate_fhir_data
+    
     try:
         # ensure FHIR server is reachable
         sync_service = FHIRSyncService()
         if not sync_service.check_server_availability():
             return {'error': 'FHIR server not available'}
         
-        # Find the queued item to sync
-        queue_item = SyncQueue.objects.get(
-            resource_type=resource_type,
-            resource_id=resource_id,
-            status__in=['pending', 'failed']  # Only sync items that need processing
-        )
+        # Claim the queued item atomically so two workers never sync the same row.
+        # Rows locked by another worker are skipped and surface as DoesNotExist.
+        # The lock is released before any network I/O happens.
+        with transaction.atomic():
+            queue_item = SyncQueue.objects.select_for_update(skip_locked=True).get(
+                resource_type=resource_type,
+                resource_id=resource_id,
+                status__in=['pending', 'failed']  # Only sync items that need processing
+            )
+            queue_item.status = 'processing'
+            queue_item.save(update_fields=['status', 'updated_at'])
         
         # Validate FHIR data before attempting sync
         if queue_item.fhir_data:
@@ -105,13 +301,12 @@ def sync_single_resource_task(resource_type, resource_id, operation='create'):
             'fhir_id': queue_item.fhir_id
         }
     except SyncQueue.DoesNotExist:
-        return {'error': 'Queue item not found'}
+        return {'error': 'Queue item not found or already being processed'}
     except ConnectionError as e:
         logger.error(f"Connection error during single resource sync: {e}")
         return {'error': f'Connection error: {str(e)}'}
     except Exception as e:
-        logger.error(f"Single resource sync failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"Single resource sync failed: {e}")
         return {'error': str(e)}
 
 
@@ -120,6 +315,8 @@ def sync_single_resource_task(resource_type, resource_id, operation='create'):
 @shared_task
 def cleanup_stuck_processing_items():
     """Clean up items stuck in processing status and remove duplicates"""
+    from django.db.models import Count
+    
     try:
         # Add Appointment to the resource types to clean up
         resource_types = ['Observation', 'Patient', 'Encounter', 'Appointment', 'AllergyIntolerance', 'Practitioner', 'Condition', 'MedicationStatement', 'Procedure', 'Immunization']
@@ -137,9 +334,9 @@ def cleanup_stuck_processing_items():
                 updated_at__lt=stuck_threshold
             )
             
-            stuck_count = stuck_items.count()
-            if stuck_count > 0:
-                stuck_items.update(status='pending')
+            # update() returns the affected row count, no need to count first
+            stuck_count = stuck_items.update(status='pending')
+            if stuck_count:
                 total_stuck_reset += stuck_count
                 logger.info(f"Reset {stuck_count} stuck {resource_type} items back to pending")
             
@@ -159,14 +356,16 @@ def cleanup_stuck_processing_items():
                     status__in=['pending', 'processing']
                 ).order_by('created_at')
                 
-                if items.count() > 1:
-                    # Keep the oldest, delete the rest
-                    oldest = items.first()
-                    duplicates = items.exclude(id=oldest.id)
-                    duplicate_count = duplicates.count()
-                    
-                    logger.info(f"Removing {duplicate_count} duplicate {resource_type} items for object_id {obj_id}, keeping item {oldest.id}")
-                    duplicates.delete()
+                # Keep the oldest, delete the rest
+                oldest = items.first()
+                if oldest is None:
+                    continue
+                
+                # delete() returns (total, per_model); only count queue rows, not cascaded logs
+                _, deleted_per_model = items.exclude(id=oldest.id).delete()
+                duplicate_count = deleted_per_model.get(SyncQueue._meta.label, 0)
+                if duplicate_count:
+                    logger.info(f"Removed {duplicate_count} duplicate {resource_type} items for object_id {obj_id}, keeping item {oldest.id}")
                     total_duplicates_removed += duplicate_count
         
         # 3. Check for items that have been pending too long (over 24 hours)
@@ -197,22 +396,3 @@ def cleanup_stuck_processing_items():
     except Exception as e:
         logger.error(f"Cleanup task failed: {e}")
         return {'error': str(e)}
-
-@shared_task  
-def cleanup_sync_tasks():
-    """Enhanced cleanup that includes stuck items"""
-    try:
-        # Run your existing cleanup logic first
-        # ... your existing cleanup code ...
-        
-        # Then run the new stuck items cleanup
-        stuck_cleanup = cleanup_stuck_processing_items()
-        
-        return {
-            'regular_cleanup': 'completed',
-            'stuck_cleanup': stuck_cleanup
-        }
-        
-    except Exception as e:
-        logger.error(f"Enhanced cleanup failed: {e}")
-        return {'error': str(e)}
\ No newline at end of file
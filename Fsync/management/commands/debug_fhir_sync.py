@@ -1,8 +1,24 @@
 from django.core.management.base import BaseCommand
-from django.db import models
+from django.db import connection, models
 from Fsync.models import SyncQueue, SyncLog
 from Fsync.syncManager import FHIRSyncService
 
+def _approx_count(qs):
+    """
+    Estimate the row count of a queryset from the PostgreSQL planner.
+
+    COUNT(*) scans the whole table on PostgreSQL, which is too slow for a
+    debug overview on a large SyncQueue. The planner estimate is instant.
+    Other database backends fall back to an exact count.
+    """
+    if connection.vendor != 'postgresql':
+        return qs.count()
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute("EXPLAIN (FORMAT JSON) " + sql, params)
+        plan = cursor.fetchone()[0]
+    return plan[0]['Plan']['Plan Rows']
+
 class Command(BaseCommand):
     help = 'Debug and manually sync FHIR resources'
 
@@ -26,40 +42,48 @@ class Command(BaseCommand):
             self.manually_sync_observation(options['sync_observation'])
     
     def debug_sync_queue(self):
-        """Debug function to check sync queue status"""
+        """Debug function to check sync queue status (counts are planner estimates on PostgreSQL)"""
         # Check pending items
         pending = SyncQueue.objects.filter(status='pending')
-        self.stdout.write(f"Pending sync items: {pending.count()}")
+        pending_preview = list(pending.only('resource_type', 'resource_id', 'operation')[:5])
+        pending_count = max(_approx_count(pending), len(pending_preview))
+        self.stdout.write(f"Pending sync items: ~{pending_count}")
         
-        for item in pending[:5]:  # Show first 5
+        for item in pending_preview:  # Show first 5
             self.stdout.write(f"  - {item.resource_type} {item.resource_id}: {item.operation}")
         
         # Check failed items
         failed = SyncQueue.objects.filter(status='failed')
-        self.stdout.write(f"\nFailed sync items: {failed.count()}")
+        failed_preview = list(failed.only('resource_type', 'resource_id', 'error_message')[:5])
+        failed_count = max(_approx_count(failed), len(failed_preview))
+        self.stdout.write(f"\nFailed sync items: ~{failed_count}")
         
-        for item in failed[:5]:  # Show first 5
-            self.stdout.write(f"  - {item.resource_type} {item.resource_id}: {item.error_message[:100]}")
+        for item in failed_preview:  # Show first 5
+            self.stdout.write(f"  - {item.resource_type} {item.resource_id}: {(item.error_message or '')[:100]}")
         
         # Check recent logs
-        recent_errors = SyncLog.objects.filter(level='ERROR').order_by('-timestamp')[:5]
+        recent_errors = list(
+            SyncLog.objects.filter(level='ERROR').only('timestamp', 'message').order_by('-timestamp')[:5]
+        )
         self.stdout.write(f"\nRecent error logs:")
         
         for log in recent_errors:
             self.stdout.write(f"  - {log.timestamp}: {log.message[:100]}")
         
         return {
-            'pending': pending.count(),
-            'failed': failed.count(),
-            'success': SyncQueue.objects.filter(status='success').count()
+            'pending': pending_count,
+            'failed': failed_count,
+            'success': _approx_count(SyncQueue.objects.filter(status='success'))
         }
     
     def manually_sync_observation(self, observation_id):
         """Manually trigger sync for a specific observation"""
-        from Clinical.models import Observation  # Adjust import path
+        from MedicalRecords.models import Observation
         
         try:
-            observation = Observation.objects.get(id=observation_id)
+            # Load the related rows to_fhir_dict() reads in the same query
+            observation = Observation.objects.select_related('patient', 'encounter').get(id=observation_id)
+            fhir_data = observation.to_fhir_dict()
             
             # Create or get queue item
             queue_item, created = SyncQueue.objects.get_or_create(
@@ -68,7 +92,7 @@ class Command(BaseCommand):
                 defaults={
                     'resource_id': str(observation.id),
                     'operation': 'create',
-                    'fhir_data': observation.to_fhir_dict(),
+                    'fhir_data': fhir_data,
                     'status': 'pending'
                 }
             )
@@ -77,7 +101,7 @@ class Command(BaseCommand):
                 # Reset failed item
                 queue_item.status = 'pending'
                 queue_item.attempts = 0
-                queue_item.fhir_data = observation.to_fhir_dict()
+                queue_item.fhir_data = fhir_data
                 queue_item.save()
             
             # Sync immediately
@@ -1,9 +1,17 @@
+import select
+import time
+from django.conf import settings
+from django.db import connection
 from django.core.management.base import BaseCommand
 from django.utils import timezone
-from Fsync.services import SyncQueueManager, FHIRSyncService
+from Fsync.queueManager import SyncQueueManager
+from Fsync.syncManager import FHIRSyncService
 from Fsync.tasks import full_sync_task, process_sync_queue_task
 from Fsync.models import SyncQueue, FHIRSyncConfig
 
+# Channel notified by the SyncQueue trigger from migration 0006
+QUEUE_NOTIFY_CHANNEL = 'fsync_syncqueue'
+
 
 class Command(BaseCommand):
     help = 'FHIR Sync Management Command'
@@ -11,7 +19,7 @@ class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument(
             '--action',
-            choices=['process', 'full-sync', 'retry', 'stats', 'test-connection'],
+            choices=['process', 'worker', 'full-sync', 'retry', 'stats', 'test-connection'],
             required=True,
             help='Action to perform'
         )
@@ -45,6 +53,9 @@ class Command(BaseCommand):
                 )
             )
         
+        elif action == 'worker':
+            self.run_worker(options['limit'])
+        
         elif action == 'full-sync':
             self.stdout.write('Starting full sync...')
             task = full_sync_task.delay(resource_types=options['resource_types'])
@@ -97,3 +108,65 @@ class Command(BaseCommand):
                 self.stdout.write(
                     self.style.ERROR(f"✗ Connection test failed: {e}")
                 )
+    
+    def run_worker(self, limit):
+        """
+        Process the sync queue continuously with adaptive polling.
+        
+        Polls at FHIR_SYNC_POLL_MIN_INTERVAL while batches come back non-empty and
+        backs off by FHIR_SYNC_POLL_BACKOFF_FACTOR up to FHIR_SYNC_POLL_MAX_INTERVAL
+        while the queue is idle, so idle periods cost few queries and bursts are
+        picked up quickly.
+        
+        On PostgreSQL the worker also LISTENs for the notifications sent when an
+        item becomes pending (migration 0006), so an idle worker wakes up as
+        soon as work arrives and the backoff only bounds lost wakeups.
+        """
+        min_interval = settings.FHIR_SYNC_POLL_MIN_INTERVAL
+        max_interval = settings.FHIR_SYNC_POLL_MAX_INTERVAL
+        backoff_factor = settings.FHIR_SYNC_POLL_BACKOFF_FACTOR
+        interval = min_interval
+        listener = self.listen_for_queue_items()
+        
+        self.stdout.write(f'Sync queue worker started (limit={limit}, poll {min_interval}s-{max_interval}s)')
+        try:
+            while True:
+                results = SyncQueueManager.process_queue(limit=limit)
+                if results['total']:
+                    self.stdout.write(
+                        f"Processed {results['total']} items: "
+                        f"{results['success']} success, {results['failed']} failed"
+                    )
+                    interval = min_interval
+                else:
+                    interval = min(interval * backoff_factor, max_interval)
+                
+                if listener is not None and connection.connection is not listener:
+                    # Django reconnected; LISTEN is per session
+                    listener = self.listen_for_queue_items()
+                self.wait_for_queue_items(listener, interval)
+        except KeyboardInterrupt:
+            self.stdout.write(self.style.SUCCESS('Sync queue worker stopped'))
+    
+    def listen_for_queue_items(self):
+        """LISTEN for new pending queue items; returns the raw connection, or None when unsupported"""
+        if connection.vendor != 'postgresql':
+            return None
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute(f'LISTEN {QUEUE_NOTIFY_CHANNEL}')
+        except Exception as e:
+            self.stdout.write(self.style.WARNING(f"LISTEN failed, falling back to polling: {e}"))
+            return None
+        return connection.connection
+    
+    def wait_for_queue_items(self, listener, timeout):
+        """Sleep up to 'timeout' seconds, returning early when a queue notification arrives"""
+        if listener is None:
+            time.sleep(timeout)
+            return
+        # Notifications received while processing the last batch are already queued
+        if not listener.notifies:
+            if select.select([listener], [], [], timeout)[0]:
+                listener.poll()
+        listener.notifies.clear()
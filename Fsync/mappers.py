@@ -1,55 +1,280 @@
 # ============================================================================
 # mappers.py - FHIR Resource Mappers
 # ============================================================================
-from typing import Dict, Any, Optional, List
-from django.db import models
-from datetime import datetime
+from typing import Dict, Any, Optional
+from decimal import Decimal
 from django.utils import timezone
+import functools
 import logging
+import operator
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+    import json
 
 logger = logging.getLogger(__name__)
 
+# Per-class cache of which requested field names a model class provides,
+# keyed by (model class, field name tuple). See FHIRMapper.get_field_values.
+_FIELD_PLANS: Dict[tuple, tuple] = {}
+
+# Per-class cache of the model's own FHIR conversion method (or None), keyed by
+# (class, method names). See FHIRMapper.native_converter.
+_NATIVE_CONVERTERS: Dict[tuple, Any] = {}
+
+# operator.attrgetter instances for dotted paths, keyed by path. See _safe_get.
+_ATTR_GETTERS: Dict[str, Any] = {}
+
+# FHIR administrative-gender codes keyed by the (lower-cased) values HMS models store
+_GENDER_MAP = {
+    'male': 'male', 'm': 'male',
+    'female': 'female', 'f': 'female',
+    'other': 'other', 'o': 'other',
+    'unknown': 'unknown', 'u': 'unknown',
+}
+
+# Values that already are FHIR gender codes (what the Patient model stores)
+_PASSTHROUGH_GENDERS = frozenset(('male', 'female', 'other', 'unknown'))
+
+
+def _safe_get(obj, attr_path: str, default=None):
+    """Safely get nested attribute from object"""
+    # Fast path: nearly every caller passes a plain attribute name
+    if '.' not in attr_path:
+        try:
+            result = getattr(obj, attr_path, default)
+        except TypeError:
+            return default
+        return default if result is None else result
+    
+    # Dotted paths: one cached C-level attrgetter per path. A missing attribute
+    # or a None along the way raises AttributeError and yields the default.
+    getter = _ATTR_GETTERS.get(attr_path)
+    if getter is None:
+        getter = _ATTR_GETTERS[attr_path] = operator.attrgetter(attr_path)
+    try:
+        result = getter(obj)
+    except (AttributeError, TypeError):
+        return default
+    return default if result is None else result
+
+
+def _fmt_datetime(dt) -> Optional[str]:
+    """Format datetime for FHIR"""
+    if dt is None:
+        return None
+    if dt.__class__ is str:
+        return dt
+    # datetime.isoformat() is implemented in C; hand-formatting is slower
+    return dt.isoformat()
+
+
+def _fmt_date(dt) -> Optional[str]:
+    """Format date for FHIR"""
+    if dt is None:
+        return None
+    if dt.__class__ is str:
+        return dt
+    # isoformat() is much cheaper than strftime(); [:10] also covers datetimes
+    return dt.isoformat()[:10]
+
+
+def _id_str(value) -> str:
+    """Return an identifier as a string, without re-stringifying text ids"""
+    if value.__class__ is str:
+        return value
+    return str(value)
+
+
+def _numeric_value(value) -> Optional[float]:
+    """Return value as a float, or None when it is not numeric"""
+    if isinstance(value, (int, float, Decimal)) and not isinstance(value, bool):
+        return float(value)
+    if isinstance(value, str):
+        try:
+            return float(value)
+        except ValueError:
+            return None
+    return None
+
+
+@functools.lru_cache(maxsize=10_000)
+def _patient_ref(patient_id) -> Dict[str, str]:
+    """Reference to a Patient; cached, so rows for the same patient share one (read-only) dict"""
+    return {"reference": f"Patient/{patient_id}"}
+
+
+@functools.lru_cache(maxsize=10_000)
+def _encounter_ref(encounter_id) -> Dict[str, str]:
+    """Reference to an Encounter; cached like _patient_ref (read-only)"""
+    return {"reference": f"Encounter/{encounter_id}"}
+
+
+class _AnyName:
+    """Field-name set for non-model objects: every name may exist, probe with getattr"""
+    
+    def __contains__(self, name):
+        return True
+
+
+_ANY_NAME = _AnyName()
+
+
+@functools.lru_cache(maxsize=None)
+def _model_field_names(model_class):
+    """
+    Names of the fields a Django model class defines, worked out once per class.
+    
+    Lets the mappers skip hasattr probes for fields the model does not have.
+    Non-model classes get _ANY_NAME, so their attributes are still probed.
+    """
+    meta = getattr(model_class, '_meta', None)
+    if meta is None:
+        return _ANY_NAME
+    return frozenset(field.name for field in meta.get_fields())
+
+
+@functools.lru_cache(maxsize=None)
+def _encryption_capable(model_class) -> bool:
+    """Whether instances of model_class provide get_encrypted_field (checked once per class)"""
+    return hasattr(model_class, 'get_encrypted_field')
+
+
+def _map_gender(gender) -> str:
+    """Map an HMS gender value to a FHIR administrative-gender code"""
+    if gender in _PASSTHROUGH_GENDERS:
+        return gender
+    if not gender:
+        return 'unknown'
+    return _GENDER_MAP.get(str(gender).lower(), 'unknown')
+
+
+class BulkMapContext:
+    """
+    Per-run state for bulk mapping (map_queryset_to_fhir), passed to
+    to_fhir(obj, ctx). Single-record calls pass no context.
+    """
+    __slots__ = ('now_iso',)
+    
+    def __init__(self, now_iso: str):
+        # Fallback timestamp for the whole run, instead of timezone.now() per record
+        self.now_iso = now_iso
+
 
 class FHIRMapper:
-    """Base class for FHIR resource mappers"""
+    """
+    Base class for FHIR resource mappers.
+    
+    Mapper output contains JSON primitives only (str, int, float, bool, None,
+    dicts and lists): dates are emitted as ISO strings and numeric values as
+    float, never Decimal, so dumps_fhir can serialize it without conversion.
+    """
+    
+    # Forward (FK/one-to-one) relations the mapper follows, joined in by
+    # prefetch_queryset when a whole queryset is mapped
+    related_fields = ()
+    
+    # Kept as class attributes for existing callers; the mappers below call
+    # the module-level functions directly.
+    safe_get_attr = staticmethod(_safe_get)
+    format_datetime = staticmethod(_fmt_datetime)
+    format_date = staticmethod(_fmt_date)
+    
+    @classmethod
+    def prefetch_queryset(cls, queryset):
+        """
+        Return queryset with the relations this mapper follows loaded up front.
+        
+        Only relations listed in related_fields that the model actually has are
+        passed to select_related; with none, the queryset is returned unchanged
+        (a bare select_related() would follow every non-null FK).
+        """
+        if not cls.related_fields:
+            return queryset
+        forward_relations = {
+            field.name for field in queryset.model._meta.get_fields()
+            if field.many_to_one or field.one_to_one
+        }
+        related = [name for name in cls.related_fields if name in forward_relations]
+        if related:
+            queryset = queryset.select_related(*related)
+        return queryset
     
     @staticmethod
-    def safe_get_attr(obj, attr_path: str, default=None):
-        """Safely get nested attribute from object"""
-        try:
-            attrs = attr_path.split('.')
-            result = obj
-            for attr in attrs:
-                result = getattr(result, attr, default)
-                if result is None:
-                    return default
-            return result
-        except (AttributeError, TypeError):
-            return default
+    def get_field_values(obj, field_names) -> Dict[str, Any]:
+        """
+        Read several fields at once, straight from the instance __dict__.
+        
+        Loaded Django model fields (including decrypted encrypted fields) live in
+        __dict__, so this avoids a descriptor lookup per field. Names that are not
+        in __dict__ (deferred fields, properties, plain objects) fall back to getattr.
+        Blank strings are returned as None, like Patient.get_encrypted_field.
+        """
+        instance_dict = getattr(obj, '__dict__', {})
+        values = dict.fromkeys(field_names)
+        for name in FHIRMapper._field_plan(type(obj), field_names):
+            if name in instance_dict:
+                value = instance_dict[name]
+            else:
+                try:
+                    value = getattr(obj, name, None)
+                except Exception as e:
+                    logger.warning(f"Could not get field {name}: {e}")
+                    value = None
+            if isinstance(value, str) and not value.strip():
+                value = None
+            values[name] = value
+        return values
     
     @staticmethod
-    def format_datetime(dt) -> Optional[str]:
-        """Format datetime for FHIR"""
-        if dt is None:
-            return None
-        if isinstance(dt, str):
-            return dt
-        return dt.isoformat()
+    def _field_plan(model_class, field_names) -> tuple:
+        """
+        Return the subset of field_names that model_class can provide.
+        
+        Worked out once per class: Django exposes every concrete field as a class
+        attribute, so names the model does not have are dropped up front instead of
+        failing a getattr on every record. Non-model classes keep all names, since
+        their attributes may only exist on instances.
+        """
+        key = (model_class, field_names)
+        plan = _FIELD_PLANS.get(key)
+        if plan is None:
+            if hasattr(model_class, '_meta'):
+                plan = tuple(name for name in field_names if hasattr(model_class, name))
+            else:
+                plan = tuple(field_names)
+            _FIELD_PLANS[key] = plan
+        return plan
     
     @staticmethod
-    def format_date(dt) -> Optional[str]:
-        """Format date for FHIR"""
-        if dt is None:
-            return None
-        if isinstance(dt, str):
-            return dt
-        return dt.strftime('%Y-%m-%d')
-
+    def native_converter(obj, method_names=('to_fhir_dict',)):
+        """
+        Return the first of method_names defined on type(obj), or None.
+        
+        Whether a model provides its own FHIR conversion is a property of the
+        class, so the lookup is done once per class instead of a hasattr per record.
+        The returned function is unbound: call it as converter(obj).
+        """
+        key = (type(obj), method_names)
+        try:
+            return _NATIVE_CONVERTERS[key]
+        except KeyError:
+            pass
+        converter = None
+        for name in method_names:
+            converter = getattr(type(obj), name, None)
+            if converter is not None:
+                break
+        _NATIVE_CONVERTERS[key] = converter
+        return converter
+    
     @staticmethod
     def safe_get_encrypted_field(obj, field_name: str, default=None):
         """Safely get encrypted field value from object"""
         try:
-            if hasattr(obj, 'get_encrypted_field'):
+            if _encryption_capable(type(obj)):
                 value = obj.get_encrypted_field(field_name)
                 return value if value is not None else default
             else:
@@ -59,98 +284,173 @@ class FHIRMapper:
             return default
 
 
+# Patient model fields read by the manual Patient mapping
+_PATIENT_FIELDS = (
+    'patient_id', 'active', 'gender', 'birth_date', 'country',
+    'given_name', 'family_name', 'middle_name', 'name_prefix', 'name_suffix',
+    'primary_phone', 'secondary_phone', 'email',
+    'address_line1', 'address_line2', 'city', 'state_province', 'postal_code',
+    'national_id', 'medical_record_number',
+)
+
+
+# (field, entry template) for the Patient telecom entries, in output order
+_PATIENT_TELECOM_SPEC = (
+    ('primary_phone', {"system": "phone", "use": "home"}),
+    ('secondary_phone', {"system": "phone", "use": "work"}),
+    ('email', {"system": "email"}),
+)
+
+# Shared CodeableConcepts (read-only). Mapper output is only read and serialized,
+# never mutated in place, so these are referenced rather than rebuilt per record.
+_MR_IDENTIFIER_TYPE = {"coding": [{"system": "http://terminology.hl7.org/CodeSystem/v2-0203", "code": "MR"}]}
+_VITAL_SIGNS_CATEGORY = [{
+    "coding": [{
+        "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+        "code": "vital-signs",
+        "display": "Vital Signs"
+    }]
+}]
+
+# Code systems used by the mappers (read-only)
+_LOINC = "http://loinc.org"
+_SNOMED = "http://snomed.info/sct"
+_UCUM = "http://unitsofmeasure.org"
+
+# Condition clinicalStatus concepts keyed by code; other statuses map to 'active'.
+# The keys double as the set of valid codes (one hash lookup per record).
+_CONDITION_CLINICAL_SYSTEM = "http://terminology.hl7.org/CodeSystem/condition-clinical"
+_CONDITION_CLINICAL_STATUS = {
+    code: {"coding": [{"system": _CONDITION_CLINICAL_SYSTEM, "code": code}]}
+    for code in ('active', 'recurrence', 'relapse', 'inactive', 'remission', 'resolved')
+}
+
+# (field, entry template) for the Patient identifiers, in output order
+_PATIENT_IDENTIFIER_SPEC = (
+    ('patient_id', {
+        "use": "usual",
+        "type": _MR_IDENTIFIER_TYPE,
+    }),
+    ('national_id', {
+        "use": "official",
+        "type": {"text": "National ID"},
+        "system": "http://example.org/national-id",
+    }),
+    ('medical_record_number', {
+        "use": "usual",
+        "type": _MR_IDENTIFIER_TYPE,
+    }),
+)
+
+
 class PatientMapper(FHIRMapper):
     """Mapper for Patient resources with encryption support"""
     
     @classmethod
-    def to_fhir(cls, patient) -> Dict[str, Any]:
+    def to_fhir(cls, patient, ctx=None) -> Dict[str, Any]:
         """Convert Patient model to FHIR Patient resource"""
         try:
-            # Use the Patient model's built-in FHIR conversion method
-            if hasattr(patient, 'to_fhir_dict'):
-                return patient.to_fhir_dict()
-            
-            # Fallback manual mapping for encrypted fields
-            return cls._manual_patient_mapping(patient)
-            
+            return cls._to_fhir_unsafe(patient)
         except Exception as e:
             logger.error(f"Error mapping patient to FHIR: {e}")
-            # Return minimal valid FHIR resource
-            return {
-                "resourceType": "Patient",
-                "id": getattr(patient, 'patient_id', None),
-                "active": getattr(patient, 'active', True)
-            }
+            return cls._minimal_resource(patient)
     
     @classmethod
-    def _manual_patient_mapping(cls, patient) -> Dict[str, Any]:
-        """Manual mapping for Patient with encrypted fields"""
-        fhir_data = {
+    def _to_fhir_unsafe(cls, patient) -> Dict[str, Any]:
+        """to_fhir without the error fallback; callers handle exceptions"""
+        # Use the Patient model's built-in FHIR conversion method
+        converter = cls.native_converter(patient)
+        if converter is not None:
+            return converter(patient)
+        
+        # Fallback manual mapping for encrypted fields
+        return cls._manual_patient_mapping(patient)
+    
+    @staticmethod
+    def _minimal_resource(patient) -> Dict[str, Any]:
+        """Minimal valid FHIR Patient resource, used when mapping fails"""
+        return {
             "resourceType": "Patient",
             "id": getattr(patient, 'patient_id', None),
-            "active": getattr(patient, 'active', True),
+            "active": getattr(patient, 'active', True)
         }
+    
+    @classmethod
+    def to_fhir_many(cls, queryset, chunk_size: int = 2000):
+        """
+        Map a Patient queryset to FHIR Patient resources, yielding one dict per patient.
+
+        Rows are streamed with iterator(chunk_size=...), so a large export costs one
+        query per chunk and memory stays flat. No only() is applied: to_fhir_dict reads
+        most Patient columns, and deferring them would trigger a query per field.
+        Single-object callers keep using to_fhir.
+        """
+        for patient in cls.prefetch_queryset(queryset).iterator(chunk_size=chunk_size):
+            try:
+                fhir_data = cls._to_fhir_unsafe(patient)
+            except Exception as e:
+                logger.error(f"Error mapping patient {getattr(patient, 'patient_id', None)} to FHIR: {e}")
+                fhir_data = cls._minimal_resource(patient)
+            yield fhir_data
+
+    @classmethod
+    def to_fhir_json(cls, patient) -> bytes:
+        """Convert Patient model to a serialized FHIR Patient resource (JSON bytes)"""
+        return dumps_fhir(cls.to_fhir(patient))
+    
+    _map_gender = staticmethod(_map_gender)
+    
+    @classmethod
+    def _manual_patient_mapping(cls, patient) -> Dict[str, Any]:
+        """Manual mapping for Patient with encrypted fields"""
+        # Read every field once from the instance
+        v = cls.get_field_values(patient, _PATIENT_FIELDS)
         
         # Handle name with encrypted fields
-        given_name = cls.safe_get_encrypted_field(patient, 'given_name')
-        family_name = cls.safe_get_encrypted_field(patient, 'family_name')
-        middle_name = cls.safe_get_encrypted_field(patient, 'middle_name')
-        name_prefix = cls.safe_get_encrypted_field(patient, 'name_prefix')
-        name_suffix = cls.safe_get_encrypted_field(patient, 'name_suffix')
+        given_name = v['given_name']
+        family_name = v['family_name']
+        middle_name = v['middle_name']
+        name_prefix = v['name_prefix']
+        name_suffix = v['name_suffix']
         
+        names = None
         if given_name or family_name:
             name_data = {"use": "official"}
             if family_name:
                 name_data["family"] = family_name
             if given_name:
-                name_data["given"] = [given_name]
-                if middle_name:
-                    name_data["given"].append(middle_name)
+                name_data["given"] = [given_name, middle_name] if middle_name else [given_name]
             if name_prefix:
                 name_data["prefix"] = [name_prefix]
             if name_suffix:
                 name_data["suffix"] = [name_suffix]
-            
-            fhir_data["name"] = [name_data]
+            names = [name_data]
         
         # Handle gender
-        if hasattr(patient, 'gender') and patient.gender and patient.gender != "unknown":
-            fhir_data["gender"] = patient.gender
-        
-        # Handle birth date
-        if hasattr(patient, 'birth_date') and patient.birth_date:
-            fhir_data["birthDate"] = cls.format_date(patient.birth_date)
+        gender = _map_gender(v['gender'])
         
         # Handle telecom with encrypted fields
-        telecom = []
-        primary_phone = cls.safe_get_encrypted_field(patient, 'primary_phone')
-        secondary_phone = cls.safe_get_encrypted_field(patient, 'secondary_phone')
-        email = cls.safe_get_encrypted_field(patient, 'email')
-        
-        if primary_phone:
-            telecom.append({"system": "phone", "value": primary_phone, "use": "home"})
-        if secondary_phone:
-            telecom.append({"system": "phone", "value": secondary_phone, "use": "work"})
-        if email:
-            telecom.append({"system": "email", "value": email})
-        
-        if telecom:
-            fhir_data["telecom"] = telecom
+        telecom = [
+            {**template, "value": v[field]}
+            for field, template in _PATIENT_TELECOM_SPEC
+            if v[field]
+        ]
         
         # Handle address with encrypted fields
-        address_line1 = cls.safe_get_encrypted_field(patient, 'address_line1')
-        address_line2 = cls.safe_get_encrypted_field(patient, 'address_line2')
-        city = cls.safe_get_encrypted_field(patient, 'city')
-        state_province = cls.safe_get_encrypted_field(patient, 'state_province')
-        postal_code = cls.safe_get_encrypted_field(patient, 'postal_code')
-        
-        if any([address_line1, city, state_province, postal_code]):
+        address_line1 = v['address_line1']
+        address_line2 = v['address_line2']
+        city = v['city']
+        state_province = v['state_province']
+        postal_code = v['postal_code']
+        
+        addresses = None
+        if address_line1 or city or state_province or postal_code:
             address_data = {"use": "home", "type": "physical"}
             
-            if address_line1 or address_line2:
-                lines = [line for line in [address_line1, address_line2] if line]
-                if lines:
-                    address_data["line"] = lines
+            if address_line1 and address_line2:
+                address_data["line"] = [address_line1, address_line2]
+            elif address_line1 or address_line2:
+                address_data["line"] = [address_line1 or address_line2]
             
             if city:
                 address_data["city"] = city
@@ -158,72 +458,54 @@ class PatientMapper(FHIRMapper):
                 address_data["state"] = state_province
             if postal_code:
                 address_data["postalCode"] = postal_code
-            if hasattr(patient, 'country') and patient.country:
-                address_data["country"] = patient.country
-            
-            fhir_data["address"] = [address_data]
-        
-        # Handle identifiers with encrypted fields
-        identifiers = []
-        
-        # Primary identifier
-        primary_id = patient.patient_id
-        if primary_id:
-            identifiers.append({
-                "use": "usual",
-                "type": {
-                    "coding": [{"system": "http://terminology.hl7.org/CodeSystem/v2-0203", "code": "MR"}]
-                },
-                "value": primary_id
-            })
-        
-        # National ID
-        national_id = cls.safe_get_encrypted_field(patient, 'national_id')
-        if national_id:
-            identifiers.append({
-                "use": "official",
-                "type": {"text": "National ID"},
-                "value": national_id,
-                "system": "http://example.org/national-id"
-            })
-        
-        # Medical Record Number
-        mrn = cls.safe_get_encrypted_field(patient, 'medical_record_number')
-        if mrn:
-            identifiers.append({
-                "use": "usual",
-                "type": {
-                    "coding": [{"system": "http://terminology.hl7.org/CodeSystem/v2-0203", "code": "MR"}]
-                },
-                "value": mrn
-            })
-        
-        if identifiers:
-            fhir_data["identifier"] = identifiers
-        
-        return fhir_data
+            if v['country']:
+                address_data["country"] = v['country']
+            addresses = [address_data]
+        
+        # Handle identifiers with encrypted fields (primary ID, national ID, MRN)
+        identifiers = [
+            {**template, "value": v[field]}
+            for field, template in _PATIENT_IDENTIFIER_SPEC
+            if v[field]
+        ]
+        
+        # Build the resource in one go; absent elements are left out ("id" is always kept)
+        entries = (
+            ("resourceType", "Patient"),
+            ("id", v['patient_id']),
+            ("active", v['active'] if v['active'] is not None else True),
+            ("name", names),
+            ("gender", gender if gender != "unknown" else None),
+            ("birthDate", _fmt_date(v['birth_date']) if v['birth_date'] else None),
+            ("telecom", telecom or None),
+            ("address", addresses),
+            ("identifier", identifiers or None),
+        )
+        return {key: value for key, value in entries if value is not None or key == "id"}
 
 
 class EncounterMapper(FHIRMapper):
     """Mapper for Encounter resources"""
     
+    related_fields = ('patient',)
+    
     @classmethod
-    def to_fhir(cls, encounter) -> Dict[str, Any]:
+    def to_fhir(cls, encounter, ctx=None) -> Dict[str, Any]:
         """Convert Encounter model to FHIR Encounter resource"""
+        fields = _model_field_names(type(encounter))
         return {
             "resourceType": "Encounter",
-            "id": str(encounter.id),
+            "id": _id_str(encounter.id),
             "status": getattr(encounter, 'status', 'unknown'),
             "class": {
                 "system": "http://terminology.hl7.org/CodeSystem/v3-ActCode",
                 "code": getattr(encounter, 'encounter_class', 'AMB')
             },
-            "subject": {
-                "reference": f"Patient/{encounter.patient.patient_id}"
-            } if hasattr(encounter, 'patient') and encounter.patient else None,
+            "subject": _patient_ref(patient.patient_id)
+            if 'patient' in fields and (patient := getattr(encounter, 'patient', None)) else None,
             "period": {
-                "start": cls.format_datetime(getattr(encounter, 'start_time', None)),
-                "end": cls.format_datetime(getattr(encounter, 'end_time', None))
+                "start": _fmt_datetime(getattr(encounter, 'start_time', None)),
+                "end": _fmt_datetime(getattr(encounter, 'end_time', None))
             }
         }
 
@@ -231,18 +513,24 @@ class EncounterMapper(FHIRMapper):
 class ObservationMapper(FHIRMapper):
     """Mapper for Observation resources"""
     
+    related_fields = ('patient', 'encounter')
+    
     @classmethod
-    def to_fhir(cls, observation) -> Dict[str, Any]:
+    def to_fhir(cls, observation, ctx=None) -> Dict[str, Any]:
         """Convert Observation model to FHIR Observation resource"""
         
+        fields = _model_field_names(type(observation))
+        
         # Use model's to_fhir_dict if available
-        if hasattr(observation, 'to_fhir_dict'):
-            fhir_data = observation.to_fhir_dict()
+        converter = cls.native_converter(observation)
+        from_model_dict = converter is not None
+        if from_model_dict:
+            fhir_data = converter(observation)
         else:
             # Manual mapping as fallback
             fhir_data = {
                 "resourceType": "Observation",
-                "id": str(observation.id),
+                "id": _id_str(observation.id),
                 "status": "final",  # Default to final
             }
         
@@ -250,65 +538,62 @@ class ObservationMapper(FHIRMapper):
         
         # Add category (required by many FHIR servers)
         if "category" not in fhir_data:
-            fhir_data["category"] = [{
-                "coding": [{
-                    "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                    "code": "vital-signs",
-                    "display": "Vital Signs"
-                }]
-            }]
+            fhir_data["category"] = _VITAL_SIGNS_CATEGORY
         
         # Ensure subject reference
-        if hasattr(observation, 'patient') and observation.patient:
+        if 'patient' in fields and (patient := getattr(observation, 'patient', None)):
             if "subject" not in fhir_data or not fhir_data["subject"]:
-                fhir_data["subject"] = {
-                    "reference": f"Patient/{observation.patient.patient_id}"
-                }
+                fhir_data["subject"] = _patient_ref(patient.patient_id)
         
         # Ensure encounter reference if available
-        if hasattr(observation, 'encounter') and observation.encounter:
+        if 'encounter' in fields and (encounter := getattr(observation, 'encounter', None)):
             if "encounter" not in fhir_data or not fhir_data["encounter"]:
-                fhir_data["encounter"] = {
-                    "reference": f"Encounter/{observation.encounter.id}"
-                }
+                fhir_data["encounter"] = _encounter_ref(encounter.id)
         
         # Handle observation time (map from observation_time to effectiveDateTime)
-        if hasattr(observation, 'observation_time') and observation.observation_time:
-            fhir_data["effectiveDateTime"] = cls.format_datetime(observation.observation_time)
+        if 'observation_time' in fields and (observation_time := getattr(observation, 'observation_time', None)):
+            fhir_data["effectiveDateTime"] = _fmt_datetime(observation_time)
         elif "effectiveDateTime" not in fhir_data:
-            # Use current time as fallback
-            fhir_data["effectiveDateTime"] = cls.format_datetime(timezone.now())
+            # Use current time (or the bulk export's start time) as fallback
+            fhir_data["effectiveDateTime"] = ctx.now_iso if ctx else _fmt_datetime(timezone.now())
         
         # Handle code
-        if hasattr(observation, 'code') and observation.code:
+        if 'code' in fields and (code := getattr(observation, 'code', None)):
             if "code" not in fhir_data or not fhir_data["code"]:
                 fhir_data["code"] = {
                     "coding": [{
-                        "system": "http://loinc.org",  # Default to LOINC
-                        "code": observation.code,
-                        "display": observation.code
+                        "system": _LOINC,  # Default to LOINC
+                        "code": code,
+                        "display": code
                     }],
-                    "text": observation.code
+                    "text": code
                 }
         
         # Handle value and unit
-        if hasattr(observation, 'value') and hasattr(observation, 'unit'):
-            # Try to parse as numeric for valueQuantity
-            try:
-                numeric_value = float(observation.value)
+        if fields is _ANY_NAME:
+            has_value, has_unit = hasattr(observation, 'value'), hasattr(observation, 'unit')
+        else:
+            has_value, has_unit = 'value' in fields, 'unit' in fields
+        if has_value and has_unit:
+            # Use valueQuantity when the value is numeric
+            numeric_value = _numeric_value(observation.value)
+            if numeric_value is not None:
+                unit = observation.unit or ""
                 fhir_data["valueQuantity"] = {
                     "value": numeric_value,
-                    "unit": observation.unit or "",
-                    "system": "http://unitsofmeasure.org",
-                    "code": observation.unit or ""
+                    "unit": unit,
+                    "system": _UCUM,
+                    "code": unit
                 }
-                # Remove valueString if it exists
-                fhir_data.pop("valueString", None)
-            except (ValueError, TypeError):
+                # Remove a valueString set by the model's to_fhir_dict
+                if from_model_dict:
+                    fhir_data.pop("valueString", None)
+            else:
                 # Fall back to string value if not numeric
                 fhir_data["valueString"] = str(observation.value)
-                fhir_data.pop("valueQuantity", None)
-        elif hasattr(observation, 'value'):
+                if from_model_dict:
+                    fhir_data.pop("valueQuantity", None)
+        elif has_value:
             fhir_data["valueString"] = str(observation.value)
         
         return fhir_data
@@ -316,59 +601,71 @@ class ObservationMapper(FHIRMapper):
 class ConditionMapper(FHIRMapper):
     """Mapper for Condition resources"""
 
+    related_fields = ('patient', 'encounter')
+    
     @classmethod
-    def to_fhir(cls, condition) -> Dict[str, Any]:
+    def to_fhir(cls, condition, ctx=None) -> Dict[str, Any]:
         """Convert Condition model to FHIR Condition resource"""
         
         # Use model's to_fhir_dict if available
-        if hasattr(condition, 'to_fhir_dict'):
-            return condition.to_fhir_dict()
+        converter = cls.native_converter(condition)
+        if converter is not None:
+            return converter(condition)
+        
+        fields = _model_field_names(type(condition))
         
         # Manual mapping
         fhir_data = {
             "resourceType": "Condition",
-            "id": str(condition.id),
+            "id": _id_str(condition.id),
         }
         
         # Clinical status (required)
         status = getattr(condition, 'status', 'active')
-        fhir_data["clinicalStatus"] = {
-            "coding": [{
-                "system": "http://terminology.hl7.org/CodeSystem/condition-clinical",
-                "code": status.lower() if status.lower() in ['active', 'recurrence', 'relapse', 'inactive', 'remission', 'resolved'] else 'active'
-            }]
-        }
+        fhir_data["clinicalStatus"] = _CONDITION_CLINICAL_STATUS.get(
+            status.lower(), _CONDITION_CLINICAL_STATUS['active']
+        )
         
         # Subject (required)
-        if hasattr(condition, 'patient') and condition.patient:
-            fhir_data["subject"] = {
-                "reference": f"Patient/{condition.patient.patient_id}"
-            }
+        if 'patient' in fields and (patient := getattr(condition, 'patient', None)):
+            fhir_data["subject"] = _patient_ref(patient.patient_id)
         
         # Code
-        if hasattr(condition, 'code') and condition.code:
+        if 'code' in fields and (code := getattr(condition, 'code', None)):
+            description = getattr(condition, 'description', code)
             fhir_data["code"] = {
                 "coding": [{
-                    "system": "http://snomed.info/sct",  # Default to SNOMED
-                    "code": condition.code,
-                    "display": getattr(condition, 'description', condition.code)
+                    "system": _SNOMED,  # Default to SNOMED
+                    "code": code,
+                    "display": description
                 }],
-                "text": getattr(condition, 'description', condition.code)
+                "text": description
             }
         
         # Encounter
-        if hasattr(condition, 'encounter') and condition.encounter:
-            fhir_data["encounter"] = {
-                "reference": f"Encounter/{condition.encounter.id}"
-            }
+        if 'encounter' in fields and (encounter := getattr(condition, 'encounter', None)):
+            fhir_data["encounter"] = _encounter_ref(encounter.id)
         
         # Onset date
-        if hasattr(condition, 'onset_date') and condition.onset_date:
-            fhir_data["onsetDateTime"] = cls.format_date(condition.onset_date) + "T00:00:00Z"
+        if 'onset_date' in fields and (onset_date := getattr(condition, 'onset_date', None)):
+            fhir_data["onsetDateTime"] = _fmt_date(onset_date) + "T00:00:00Z"
         
         return fhir_data
     
     
+def dumps_fhir(fhir_data: Dict[str, Any]) -> bytes:
+    """
+    Serialize a FHIR resource dict to compact JSON bytes.
+    
+    Uses orjson when installed (a single C-level pass); otherwise falls back
+    to the json module. Mapper output is JSON-primitive only (see FHIRMapper),
+    so both paths produce the same document.
+    """
+    if orjson is not None:
+        return orjson.dumps(fhir_data)
+    return json.dumps(fhir_data, separators=(',', ':')).encode('utf-8')
+
+
 # Registry of mappers
 FHIR_MAPPERS = {
     'Patient': PatientMapper,
@@ -383,19 +680,62 @@ def get_mapper(resource_type: str) -> Optional[FHIRMapper]:
     return FHIR_MAPPERS.get(resource_type)
 
 
-def map_to_fhir(model_instance, resource_type: str = None) -> Dict[str, Any]:
-    """Map Django model instance to FHIR resource"""
-    if not resource_type:
-        # Try to infer from model name
-        resource_type = model_instance._meta.model_name.title()
+@functools.singledispatch
+def to_fhir(model_instance) -> Dict[str, Any]:
+    """
+    Map a Django model instance to a FHIR resource, dispatching on its class.
     
+    The first instance of a model class resolves the mapper from the model name
+    and registers it for that class, so later calls go straight through the
+    singledispatch type cache instead of building a resource-type string.
+    """
+    # Try to infer from model name
+    resource_type = model_instance._meta.model_name.title()
     mapper = get_mapper(resource_type)
     if mapper:
+        to_fhir.register(type(model_instance), mapper.to_fhir)
         return mapper.to_fhir(model_instance)
-    
+    return _unmapped_resource(model_instance, resource_type)
+
+
+def _unmapped_resource(model_instance, resource_type: str) -> Dict[str, Any]:
     # Fallback for unmapped resources
     logger.warning(f"No mapper found for resource type: {resource_type}")
     return {
         "resourceType": resource_type,
-        "id": str(getattr(model_instance, 'id', None))
-    }
\ No newline at end of file
+        "id": _id_str(getattr(model_instance, 'id', None))
+    }
+
+
+def map_queryset_to_fhir(queryset, resource_type: str = None, chunk_size: int = 2000):
+    """
+    Map every row of a queryset to a FHIR resource, yielding one dict per row.
+    
+    The mapper's related objects (patient, encounter) are joined in with
+    select_related and rows are streamed in chunks, so a list export costs
+    one query per chunk instead of one per row and foreign key.
+    """
+    if not resource_type:
+        resource_type = queryset.model._meta.model_name.title()
+    
+    mapper = get_mapper(resource_type)
+    if mapper is None:
+        for model_instance in queryset.iterator(chunk_size=chunk_size):
+            yield _unmapped_resource(model_instance, resource_type)
+        return
+    
+    ctx = BulkMapContext(now_iso=_fmt_datetime(timezone.now()))
+    for model_instance in mapper.prefetch_queryset(queryset).iterator(chunk_size=chunk_size):
+        yield mapper.to_fhir(model_instance, ctx)
+
+
+def map_to_fhir(model_instance, resource_type: str = None) -> Dict[str, Any]:
+    """Map Django model instance to FHIR resource"""
+    if not resource_type:
+        return to_fhir(model_instance)
+    
+    mapper = get_mapper(resource_type)
+    if mapper:
+        return mapper.to_fhir(model_instance)
+    
+    return _unmapped_resource(model_instance, resource_type)
\ No newline at end of file
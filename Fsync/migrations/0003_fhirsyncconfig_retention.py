@@ -0,0 +1,23 @@
+# Generated by Django 5.2.1 on 2026-10-17 09:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fsync', '0002_syncqueue_field_mapping_used_and_more'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='fhirsyncconfig',
+            name='log_retention_days',
+            field=models.IntegerField(default=30, help_text='Days to keep INFO/DEBUG sync logs'),
+        ),
+        migrations.AddField(
+            model_name='fhirsyncconfig',
+            name='queue_retention_days',
+            field=models.IntegerField(default=7, help_text='Days to keep successful queue items'),
+        ),
+    ]
@@ -0,0 +1,117 @@
+# Converts Fsync_synclog into a table range-partitioned by month on "timestamp",
+# so old logs can be purged by dropping whole partitions instead of DELETE scans.
+# PostgreSQL only; other database backends keep the plain table.
+
+import datetime
+
+from django.db import migrations
+
+
+TABLE = 'Fsync_synclog'
+LEGACY_TABLE = 'Fsync_synclog_legacy'
+SEQUENCE = 'Fsync_synclog_part_id_seq'
+
+
+def _month_start(d):
+    return d.replace(day=1)
+
+
+def _next_month(d):
+    return (d.replace(day=28) + datetime.timedelta(days=4)).replace(day=1)
+
+
+def partition_synclog(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    from django.utils import timezone
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        cursor.execute(f'ALTER TABLE "{LEGACY_TABLE}" RENAME CONSTRAINT "{TABLE}_pkey" TO "{LEGACY_TABLE}_pkey"')
+        cursor.execute(f'CREATE SEQUENCE "{SEQUENCE}"')
+        # The partition key must be part of the primary key. Django still treats
+        # "id" as the primary key; uniqueness comes from the sequence.
+        cursor.execute(f'''
+            CREATE TABLE "{TABLE}" (
+                "id" bigint NOT NULL DEFAULT nextval('"{SEQUENCE}"'),
+                "level" varchar(10) NOT NULL,
+                "message" text NOT NULL,
+                "details" jsonb NOT NULL,
+                "timestamp" timestamp with time zone NOT NULL,
+                "queue_item_id" integer NOT NULL
+                    REFERENCES "Fsync_syncqueue" ("id") DEFERRABLE INITIALLY DEFERRED,
+                PRIMARY KEY ("id", "timestamp")
+            ) PARTITION BY RANGE ("timestamp")
+        ''')
+        cursor.execute(f'CREATE INDEX "{TABLE}_queue_item_id_idx" ON "{TABLE}" ("queue_item_id")')
+        cursor.execute(f'CREATE INDEX "{TABLE}_timestamp_idx" ON "{TABLE}" ("timestamp")')
+        # Catch-all for rows outside the monthly partitions (and for archived
+        # WARNING/ERROR rows kept when a month is dropped)
+        cursor.execute(f'CREATE TABLE "{TABLE}_default" PARTITION OF "{TABLE}" DEFAULT')
+
+        # Monthly partitions covering existing data plus the next two months
+        cursor.execute(f'SELECT MIN("timestamp") FROM "{LEGACY_TABLE}"')
+        oldest = cursor.fetchone()[0]
+        today = timezone.now().date()
+        start = _month_start(oldest.date() if oldest else today)
+        end = _next_month(_next_month(_next_month(_month_start(today))))
+        while start < end:
+            upper = _next_month(start)
+            cursor.execute(
+                f'CREATE TABLE "{TABLE}_p{start:%Y%m}" PARTITION OF "{TABLE}" '
+                f"FOR VALUES FROM ('{start:%Y-%m-%d}') TO ('{upper:%Y-%m-%d}')"
+            )
+            start = upper
+
+        cursor.execute(f'''
+            INSERT INTO "{TABLE}" ("id", "level", "message", "details", "timestamp", "queue_item_id")
+            SELECT "id", "level", "message", "details", "timestamp", "queue_item_id"
+            FROM "{LEGACY_TABLE}"
+        ''')
+        cursor.execute(f'''
+            SELECT setval('"{SEQUENCE}"', COALESCE((SELECT MAX("id") FROM "{TABLE}"), 0) + 1, false)
+        ''')
+        cursor.execute(f'DROP TABLE "{LEGACY_TABLE}"')
+        cursor.execute(f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}"."id"')
+
+
+def unpartition_synclog(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'ALTER TABLE "{TABLE}" RENAME TO "{LEGACY_TABLE}"')
+        cursor.execute(f'ALTER TABLE "{LEGACY_TABLE}" RENAME CONSTRAINT "{TABLE}_pkey" TO "{LEGACY_TABLE}_pkey"')
+        cursor.execute(f'ALTER INDEX "{TABLE}_queue_item_id_idx" RENAME TO "{LEGACY_TABLE}_queue_item_id_idx"')
+        cursor.execute(f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY NONE')
+        cursor.execute(f'''
+            CREATE TABLE "{TABLE}" (
+                "id" bigint NOT NULL DEFAULT nextval('"{SEQUENCE}"') PRIMARY KEY,
+                "level" varchar(10) NOT NULL,
+                "message" text NOT NULL,
+                "details" jsonb NOT NULL,
+                "timestamp" timestamp with time zone NOT NULL,
+                "queue_item_id" integer NOT NULL
+                    REFERENCES "Fsync_syncqueue" ("id") DEFERRABLE INITIALLY DEFERRED
+            )
+        ''')
+        cursor.execute(f'''
+            INSERT INTO "{TABLE}" ("id", "level", "message", "details", "timestamp", "queue_item_id")
+            SELECT "id", "level", "message", "details", "timestamp", "queue_item_id"
+            FROM "{LEGACY_TABLE}"
+        ''')
+        cursor.execute(f'DROP TABLE "{LEGACY_TABLE}" CASCADE')
+        cursor.execute(f'CREATE INDEX "{TABLE}_queue_item_id_idx" ON "{TABLE}" ("queue_item_id")')
+        cursor.execute(f'ALTER SEQUENCE "{SEQUENCE}" OWNED BY "{TABLE}"."id"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fsync', '0003_fhirsyncconfig_retention'),
+    ]
+
+    operations = [
+        migrations.RunPython(partition_synclog, unpartition_synclog),
+    ]
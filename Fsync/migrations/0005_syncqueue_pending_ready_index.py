@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 12:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fsync', '0004_partition_synclog'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='syncqueue',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['priority', 'scheduled_at', 'created_at'], name='syncqueue_pending_ready'),
+        ),
+    ]
@@ -0,0 +1,54 @@
+# Notifies LISTENing sync workers (manage.py sync_fhir --action worker) when a
+# queue item becomes pending, so idle workers wake up instead of polling.
+# PostgreSQL only; other database backends keep plain polling.
+
+from django.db import migrations
+
+
+TABLE = 'Fsync_syncqueue'
+CHANNEL = 'fsync_syncqueue'
+FUNCTION = 'fsync_syncqueue_notify'
+TRIGGER = 'fsync_syncqueue_pending_notify'
+
+
+def create_notify_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        # Identical notifications within one transaction are delivered once,
+        # so a bulk enqueue wakes each worker a single time
+        cursor.execute(f'''
+            CREATE OR REPLACE FUNCTION "{FUNCTION}"() RETURNS trigger AS $$
+            BEGIN
+                PERFORM pg_notify('{CHANNEL}', '');
+                RETURN NULL;
+            END;
+            $$ LANGUAGE plpgsql
+        ''')
+        cursor.execute(f'''
+            CREATE TRIGGER "{TRIGGER}"
+            AFTER INSERT OR UPDATE OF "status" ON "{TABLE}"
+            FOR EACH ROW WHEN (NEW."status" = 'pending')
+            EXECUTE FUNCTION "{FUNCTION}"()
+        ''')
+
+
+def drop_notify_trigger(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'DROP TRIGGER IF EXISTS "{TRIGGER}" ON "{TABLE}"')
+        cursor.execute(f'DROP FUNCTION IF EXISTS "{FUNCTION}"()')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fsync', '0005_syncqueue_pending_ready_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_notify_trigger, drop_notify_trigger),
+    ]
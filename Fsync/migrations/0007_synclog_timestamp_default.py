@@ -0,0 +1,19 @@
+# Generated by Django 5.2.1 on 2026-10-17 14:00
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fsync', '0006_syncqueue_notify_trigger'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='synclog',
+            name='timestamp',
+            field=models.DateTimeField(default=django.utils.timezone.now),
+        ),
+    ]
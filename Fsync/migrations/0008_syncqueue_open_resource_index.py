@@ -0,0 +1,17 @@
+# Generated by Django 5.2.1 on 2026-10-17 15:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fsync', '0007_synclog_timestamp_default'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='syncqueue',
+            index=models.Index(condition=models.Q(('status__in', ['pending', 'processing'])), fields=['resource_type', 'resource_id'], name='syncqueue_open_resource'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.1 on 2026-10-17 18:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Fsync', '0008_syncqueue_open_resource_index'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='syncqueue',
+            name='syncqueue_pending_ready',
+        ),
+        migrations.AddIndex(
+            model_name='syncqueue',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['priority', 'created_at'], name='syncqueue_pending_fifo'),
+        ),
+    ]
@@ -194,6 +194,9 @@ from django.db import models
 from django.utils import timezone
 from django.contrib.contenttypes.models import ContentType
 from django.contrib.contenttypes.fields import GenericForeignKey
+from .fields import OrjsonJSONField
+from functools import cached_property
+from types import MappingProxyType
 import json
 
 class FHIRSyncConfig(models.Model):
@@ -212,7 +215,13 @@ class FHIRSyncConfig(models.Model):
         ('bearer', 'Bearer Token'),
         ('oauth2', 'OAuth2')
     ], default='none')
-    auth_credentials = models.JSONField(default=dict, blank=True)
+    auth_credentials = OrjsonJSONField(default=dict, blank=True)
+    
+    # Maintenance / retention
+    log_retention_days = models.IntegerField(default=30,
+                                             help_text="Days to keep INFO/DEBUG sync logs")
+    queue_retention_days = models.IntegerField(default=7,
+                                               help_text="Days to keep successful queue items")
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -224,6 +233,115 @@ class FHIRSyncConfig(models.Model):
     def __str__(self):
         return f"{self.name} - {self.base_url}"
 
+# Patient defaults shared by every SyncRule. Read-only: callers merge them
+# into new dicts together with the rule's own settings.
+_DEFAULT_PATIENT_MAPPINGS = MappingProxyType({
+    # Core identity fields
+    'patient_id': 'id',
+    'fhir_id': 'id',
+    
+    # Name fields - map to FHIR name array
+    'given_name': 'name[0].given[0]',
+    'family_name': 'name[0].family',
+    'middle_name': 'name[0].given[1]',
+    'name_prefix': 'name[0].prefix[0]',
+    'name_suffix': 'name[0].suffix[0]',
+    'name': 'name[0].text',  # Legacy field
+    
+    # Core demographics
+    'gender': 'gender',
+    'birth_date': 'birthDate',
+    
+    # Identifiers
+    'national_id': 'identifier[national_id].value',
+    'medical_record_number': 'identifier[mrn].value',
+    'insurance_number': 'identifier[insurance].value',
+    
+    # Contact information - map to telecom array
+    'primary_phone': 'telecom[phone_home].value',
+    'secondary_phone': 'telecom[phone_work].value',
+    'email': 'telecom[email].value',
+    
+    # Address fields - map to address array
+    'address_line1': 'address[0].line[0]',
+    'address_line2': 'address[0].line[1]',
+    'city': 'address[0].city',
+    'state_province': 'address[0].state',
+    'postal_code': 'address[0].postalCode',
+    'country': 'address[0].country',
+    
+    # Additional demographics
+    'marital_status': 'maritalStatus.coding[0].code',
+    'preferred_language': 'communication[0].language.coding[0].code',
+    
+    # Emergency contact - map to contact array
+    'emergency_contact_name': 'contact[0].name.text',
+    'emergency_contact_relationship': 'contact[0].relationship[0].coding[0].code',
+    'emergency_contact_phone': 'contact[0].telecom[0].value',
+    
+    # Clinical information - map to extensions
+    'blood_type': 'extension[blood_type].valueString',
+    'allergies': 'extension[allergies].valueString',
+    
+    # Status fields
+    'active': 'active',
+    'deceased': 'deceasedBoolean',
+    'deceased_date': 'deceasedDateTime',
+    
+    # Practice management - map to extensions
+    'last_arrived': 'extension[last_arrived].valueDate',
+    'registration_date': 'extension[registration_date].valueDateTime',
+    
+    # Metadata - map to meta
+    'created_at': 'meta.lastUpdated',
+    'updated_at': 'meta.lastUpdated',
+})
+
+_DEFAULT_PATIENT_TRANSFORMS = MappingProxyType({
+    'gender': {
+        'type': 'map',
+        'mapping': {
+            'male': 'male',
+            'female': 'female',
+            'other': 'other',
+            'unknown': 'unknown'
+        }
+    },
+    'marital_status': {
+        'type': 'map',
+        'mapping': {
+            'single': 'S',
+            'married': 'M',
+            'divorced': 'D',
+            'widowed': 'W',
+            'separated': 'L',
+            'unknown': 'UNK'
+        }
+    },
+    'birth_date': {
+        'type': 'date_format',
+        'format': 'YYYY-MM-DD'
+    },
+    'phone_numbers': {
+        'type': 'phone_format',
+        'format': 'international'
+    }
+})
+
+_DEFAULT_PATIENT_VALIDATIONS = MappingProxyType({
+    'required_fields': ['given_name', 'family_name'],
+    'conditional_required': {
+        'deceased': ['deceased_date']  # If deceased=True, deceased_date is required
+    },
+    'field_validations': {
+        'email': 'email_format',
+        'primary_phone': 'phone_format',
+        'secondary_phone': 'phone_format',
+        'birth_date': 'date_not_future',
+        'gender': ['male', 'female', 'other', 'unknown']
+    }
+})
+
 class SyncRule(models.Model):
     """Rules for syncing specific resource types"""
     RESOURCE_TYPES = [
@@ -253,23 +371,23 @@ class SyncRule(models.Model):
     ], default='manual')
     
     # Filtering
-    sync_filter = models.JSONField(default=dict, blank=True, 
+    sync_filter = OrjsonJSONField(default=dict, blank=True, 
                                  help_text="Django ORM filter conditions")
     
     # Enhanced field mapping configuration
-    field_mappings = models.JSONField(default=dict, blank=True,
+    field_mappings = OrjsonJSONField(default=dict, blank=True,
                                     help_text="Custom field mappings from HMS to FHIR")
     
     # Default field mappings for Patient resource type
-    default_patient_mappings = models.JSONField(default=dict, blank=True,
+    default_patient_mappings = OrjsonJSONField(default=dict, blank=True,
                                               help_text="Default Patient field mappings")
     
     # Advanced mapping options
-    transform_rules = models.JSONField(default=dict, blank=True,
+    transform_rules = OrjsonJSONField(default=dict, blank=True,
                                      help_text="Field transformation rules")
     
     # Validation rules
-    validation_rules = models.JSONField(default=dict, blank=True,
+    validation_rules = OrjsonJSONField(default=dict, blank=True,
                                       help_text="Data validation rules before sync")
     
     created_at = models.DateTimeField(auto_now_add=True)
@@ -284,141 +402,55 @@ class SyncRule(models.Model):
         return f"{self.resource_type} - {self.hms_model_app}.{self.hms_model_name}"
     
     def get_default_patient_field_mappings(self):
-        """Return default field mappings for Patient resource"""
-        return {
-            # Core identity fields
-            'patient_id': 'id',
-            'fhir_id': 'id',
-            
-            # Name fields - map to FHIR name array
-            'given_name': 'name[0].given[0]',
-            'family_name': 'name[0].family',
-            'middle_name': 'name[0].given[1]',
-            'name_prefix': 'name[0].prefix[0]',
-            'name_suffix': 'name[0].suffix[0]',
-            'name': 'name[0].text',  # Legacy field
-            
-            # Core demographics
-            'gender': 'gender',
-            'birth_date': 'birthDate',
-            
-            # Identifiers
-            'national_id': 'identifier[national_id].value',
-            'medical_record_number': 'identifier[mrn].value',
-            'insurance_number': 'identifier[insurance].value',
-            
-            # Contact information - map to telecom array
-            'primary_phone': 'telecom[phone_home].value',
-            'secondary_phone': 'telecom[phone_work].value',
-            'email': 'telecom[email].value',
-            
-            # Address fields - map to address array
-            'address_line1': 'address[0].line[0]',
-            'address_line2': 'address[0].line[1]',
-            'city': 'address[0].city',
-            'state_province': 'address[0].state',
-            'postal_code': 'address[0].postalCode',
-            'country': 'address[0].country',
-            
-            # Additional demographics
-            'marital_status': 'maritalStatus.coding[0].code',
-            'preferred_language': 'communication[0].language.coding[0].code',
-            
-            # Emergency contact - map to contact array
-            'emergency_contact_name': 'contact[0].name.text',
-            'emergency_contact_relationship': 'contact[0].relationship[0].coding[0].code',
-            'emergency_contact_phone': 'contact[0].telecom[0].value',
-            
-            # Clinical information - map to extensions
-            'blood_type': 'extension[blood_type].valueString',
-            'allergies': 'extension[allergies].valueString',
-            
-            # Status fields
-            'active': 'active',
-            'deceased': 'deceasedBoolean',
-            'deceased_date': 'deceasedDateTime',
-            
-            # Practice management - map to extensions
-            'last_arrived': 'extension[last_arrived].valueDate',
-            'registration_date': 'extension[registration_date].valueDateTime',
-            
-            # Metadata - map to meta
-            'created_at': 'meta.lastUpdated',
-            'updated_at': 'meta.lastUpdated',
-        }
+        """Return default field mappings for Patient resource (read-only mapping)"""
+        return _DEFAULT_PATIENT_MAPPINGS
     
-    def get_effective_field_mappings(self):
-        """Get the effective field mappings, combining defaults with custom mappings"""
+    # The merged settings are cached per instance (a worker reuses one rule
+    # instance for every queue item of a batch); save() drops the cache.
+    _CACHED_SETTINGS = ('effective_field_mappings', 'effective_transform_rules', 'effective_validation_rules')
+    
+    @cached_property
+    def effective_field_mappings(self):
+        """Field mappings combining defaults with custom mappings"""
         if self.resource_type == 'Patient':
-            default_mappings = self.get_default_patient_field_mappings()
             # Merge with custom mappings, custom takes precedence
-            effective_mappings = {**default_mappings, **self.field_mappings}
-            return effective_mappings
+            return {**_DEFAULT_PATIENT_MAPPINGS, **self.field_mappings}
         return self.field_mappings
     
-    def get_transform_rules(self):
-        """Get transformation rules for field values"""
-        default_transforms = {}
-        if self.resource_type == 'Patient':
-            default_transforms = {
-                'gender': {
-                    'type': 'map',
-                    'mapping': {
-                        'male': 'male',
-                        'female': 'female',
-                        'other': 'other',
-                        'unknown': 'unknown'
-                    }
-                },
-                'marital_status': {
-                    'type': 'map',
-                    'mapping': {
-                        'single': 'S',
-                        'married': 'M',
-                        'divorced': 'D',
-                        'widowed': 'W',
-                        'separated': 'L',
-                        'unknown': 'UNK'
-                    }
-                },
-                'birth_date': {
-                    'type': 'date_format',
-                    'format': 'YYYY-MM-DD'
-                },
-                'phone_numbers': {
-                    'type': 'phone_format',
-                    'format': 'international'
-                }
-            }
+    @cached_property
+    def effective_transform_rules(self):
+        """Transformation rules for field values"""
+        default_transforms = _DEFAULT_PATIENT_TRANSFORMS if self.resource_type == 'Patient' else {}
         
         # Merge with custom transform rules
         return {**default_transforms, **self.transform_rules}
     
-    def get_validation_rules(self):
-        """Get validation rules for the resource type"""
-        default_validations = {}
-        if self.resource_type == 'Patient':
-            default_validations = {
-                'required_fields': ['given_name', 'family_name'],
-                'conditional_required': {
-                    'deceased': ['deceased_date']  # If deceased=True, deceased_date is required
-                },
-                'field_validations': {
-                    'email': 'email_format',
-                    'primary_phone': 'phone_format',
-                    'secondary_phone': 'phone_format',
-                    'birth_date': 'date_not_future',
-                    'gender': ['male', 'female', 'other', 'unknown']
-                }
-            }
+    @cached_property
+    def effective_validation_rules(self):
+        """Validation rules for the resource type"""
+        default_validations = _DEFAULT_PATIENT_VALIDATIONS if self.resource_type == 'Patient' else {}
         
         # Merge with custom validation rules
         return {**default_validations, **self.validation_rules}
     
+    def get_effective_field_mappings(self):
+        """Get the effective field mappings, combining defaults with custom mappings"""
+        return self.effective_field_mappings
+    
+    def get_transform_rules(self):
+        """Get transformation rules for field values"""
+        return self.effective_transform_rules
+    
+    def get_validation_rules(self):
+        """Get validation rules for the resource type"""
+        return self.effective_validation_rules
+    
     def save(self, *args, **kwargs):
         """Override save to populate default mappings for Patient resources"""
+        for name in self._CACHED_SETTINGS:
+            self.__dict__.pop(name, None)
         if self.resource_type == 'Patient' and not self.default_patient_mappings:
-            self.default_patient_mappings = self.get_default_patient_field_mappings()
+            self.default_patient_mappings = dict(_DEFAULT_PATIENT_MAPPINGS)
         
         super().save(*args, **kwargs)
 
@@ -450,7 +482,7 @@ class SyncQueue(models.Model):
     
     # Sync data
     sync_rule = models.ForeignKey(SyncRule, on_delete=models.CASCADE, null=True, blank=True)
-    fhir_data = models.JSONField(help_text="FHIR resource JSON")
+    fhir_data = OrjsonJSONField(help_text="FHIR resource JSON")
     
     # Generic FK to HMS model instance
     content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE, null=True, blank=True)
@@ -467,14 +499,14 @@ class SyncQueue(models.Model):
     fhir_id = models.CharField(max_length=100, blank=True, null=True,
                               help_text="ID returned by FHIR server")
     error_message = models.TextField(blank=True, null=True)
-    response_data = models.JSONField(default=dict, blank=True)
+    response_data = OrjsonJSONField(default=dict, blank=True)
     
     # Enhanced tracking for new Patient fields
-    field_mapping_used = models.JSONField(default=dict, blank=True,
+    field_mapping_used = OrjsonJSONField(default=dict, blank=True,
                                         help_text="Field mappings used for this sync")
-    transform_applied = models.JSONField(default=dict, blank=True,
+    transform_applied = OrjsonJSONField(default=dict, blank=True,
                                        help_text="Transformations applied")
-    validation_results = models.JSONField(default=dict, blank=True,
+    validation_results = OrjsonJSONField(default=dict, blank=True,
                                         help_text="Validation results")
     
     # Timestamps
@@ -488,6 +520,19 @@ class SyncQueue(models.Model):
             models.Index(fields=['status', 'priority']),
             models.Index(fields=['resource_type', 'status']),
             models.Index(fields=['scheduled_at']),
+            # Dequeue path: only pending rows, already in dequeue order
+            # (FIFO within a priority; scheduled_at is only a filter)
+            models.Index(
+                fields=['priority', 'created_at'],
+                condition=models.Q(status='pending'),
+                name='syncqueue_pending_fifo',
+            ),
+            # Open-item lookup in SyncQueueManager.queue_resource
+            models.Index(
+                fields=['resource_type', 'resource_id'],
+                condition=models.Q(status__in=['pending', 'processing']),
+                name='syncqueue_open_resource',
+            ),
         ]
         verbose_name = "Sync Queue Item"
         verbose_name_plural = "Sync Queue Items"
@@ -498,28 +543,48 @@ class SyncQueue(models.Model):
     def can_retry(self):
         return self.attempts < self.max_attempts and self.status == 'failed'
     
-    def mark_processing(self):
+    # Fields touched by the mark_* methods; used when status writes are batched
+    STATUS_UPDATE_FIELDS = [
+        'status', 'attempts', 'last_attempt_at', 'completed_at', 'fhir_id',
+        'error_message', 'response_data', 'field_mapping_used',
+        'transform_applied', 'validation_results', 'updated_at',
+    ]
+    
+    # The mark_* methods only write the columns they change, so the large
+    # fhir_data document is not rewritten on every status change
+    
+    def mark_processing(self, commit=True):
         self.status = 'processing'
         self.attempts += 1
         self.last_attempt_at = timezone.now()
-        self.save()
+        if commit:
+            self.save(update_fields=['status', 'attempts', 'last_attempt_at', 'updated_at'])
     
-    def mark_success(self, fhir_id=None, response_data=None):
+    def mark_success(self, fhir_id=None, response_data=None, commit=True):
         self.status = 'success'
         self.completed_at = timezone.now()
         self.error_message = None
+        update_fields = ['status', 'completed_at', 'error_message', 'updated_at']
         if fhir_id:
             self.fhir_id = fhir_id
+            update_fields.append('fhir_id')
         if response_data:
             self.response_data = response_data
-        self.save()
+            update_fields.append('response_data')
+        if commit:
+            self.save(update_fields=update_fields)
     
-    def mark_failed(self, error_message, response_data=None):
+    def mark_failed(self, error_message, response_data=None, commit=True):
         self.status = 'failed'
         self.error_message = error_message
+        # validation_results is set by FHIRSyncService right before a validation failure
+        update_fields = ['status', 'error_message', 'validation_results', 'updated_at']
         if response_data:
             self.response_data = response_data
-        self.save()
+            update_fields.append('response_data')
+        if commit:
+            self.save(update_fields=update_fields)
+
 
 class SyncLog(models.Model):
     """Detailed logging for sync operations"""
@@ -531,8 +596,10 @@ class SyncLog(models.Model):
         ('ERROR', 'Error'),
     ], default='INFO')
     message = models.TextField()
-    details = models.JSONField(default=dict, blank=True)
-    timestamp = models.DateTimeField(auto_now_add=True)
+    details = OrjsonJSONField(default=dict, blank=True)
+    # Stamped when the log entry is built, not when it is inserted, so rows
+    # buffered by FHIRSyncService keep the time of the event
+    timestamp = models.DateTimeField(default=timezone.now)
     
     class Meta:
         ordering = ['-timestamp']
@@ -1,33 +1,43 @@
 from typing import Dict, Any
-from .mappers import FHIRMapper
-from .mappers import PatientMapper
+from .mappers import FHIRMapper, FHIR_MAPPERS, _id_str
+
+# Practitioner model fields (and common aliases) read by the mapping
+_PRACTITIONER_FIELDS = (
+    'id', 'practitioner_id', 'active', 'name',
+    'given_name', 'first_name', 'family_name', 'last_name',
+    'primary_phone', 'phone', 'email', 'role', 'specialty',
+)
+
+# Model methods that produce the FHIR dict directly, in order of preference
+_NATIVE_METHODS = ('to_fhir_dict', 'to_json')
 
 class PractitionerMapper(FHIRMapper):
     """Map HMS Practitioner to FHIR Practitioner"""
     
     @staticmethod
-    def to_fhir(practitioner) -> Dict[str, Any]:
-        # Handle existing to_fhir_dict method if available
-        if hasattr(practitioner, 'to_fhir_dict'):
-            return practitioner.to_fhir_dict()
+    def to_fhir(practitioner, ctx=None) -> Dict[str, Any]:
+        # Handle existing to_fhir_dict (or else to_json) method if available
+        converter = PractitionerMapper.native_converter(practitioner, _NATIVE_METHODS)
+        if converter is not None:
+            return converter(practitioner)
         
-        # Handle existing to_json method if available
-        if hasattr(practitioner, 'to_json'):
-            return practitioner.to_json()
+        # Read every field once from the instance
+        v = PractitionerMapper.get_field_values(practitioner, _PRACTITIONER_FIELDS)
         
         # Build name from available fields
-        given_name = (PractitionerMapper.safe_get_attr(practitioner, 'given_name') or 
-                     PractitionerMapper.safe_get_attr(practitioner, 'first_name'))
-        family_name = (PractitionerMapper.safe_get_attr(practitioner, 'family_name') or 
-                      PractitionerMapper.safe_get_attr(practitioner, 'last_name'))
+        given_name = (v['given_name'] or 
+                     v['first_name'])
+        family_name = (v['family_name'] or 
+                      v['last_name'])
         
         # Fall back to legacy name field if structured fields not available
-        if not given_name and not family_name and hasattr(practitioner, 'name'):
-            name_parts = practitioner.name.split()
-            family_name = name_parts[-1] if len(name_parts) > 1 else practitioner.name
-            given_name = " ".join(name_parts[:-1]) if len(name_parts) > 1 else ""
+        if not given_name and not family_name and v['name']:
+            # Last word is the family name, the rest are given names
+            head, _, last = v['name'].strip().rpartition(' ')
+            family_name = last if head else v['name']
+            given_name = " ".join(head.split())
         
-        names = []
+        names = None
         if given_name or family_name:
             name_data = {
                 "use": "official"
@@ -36,11 +46,10 @@ class PractitionerMapper(FHIRMapper):
                 name_data["family"] = family_name
             if given_name:
                 name_data["given"] = [given_name]
-            names.append(name_data)
+            names = [name_data]
         
         # Build identifiers
-        practitioner_id = (PractitionerMapper.safe_get_attr(practitioner, 'practitioner_id') or 
-                          str(practitioner.id))
+        practitioner_id = _id_str(v['practitioner_id'] or v['id'])
         
         fhir_data = {
             "resourceType": "Practitioner",
@@ -52,40 +61,27 @@ class PractitionerMapper(FHIRMapper):
                     "system": "http://hospital.example.org/practitioner-id"
                 }
             ],
-            "active": PractitionerMapper.safe_get_attr(practitioner, 'active', True)
+            "active": v['active'] if v['active'] is not None else True
         }
         
         if names:
             fhir_data["name"] = names
         
-        # Build telecom
-        telecom = []
-        
-        # Phone
-        phone = (PractitionerMapper.safe_get_attr(practitioner, 'primary_phone') or 
-                PractitionerMapper.safe_get_attr(practitioner, 'phone'))
-        if phone:
-            telecom.append({
-                "system": "phone",
-                "value": phone,
-                "use": "work"
-            })
-        
-        # Email
-        email = PractitionerMapper.safe_get_attr(practitioner, 'email')
-        if email:
-            telecom.append({
-                "system": "email",
-                "value": email,
-                "use": "work"
-            })
+        # Build telecom (work phone, then work email)
+        phone = (v['primary_phone'] or 
+                v['phone'])
+        email = v['email']
+        telecom = [entry for entry in (
+            {"system": "phone", "value": phone, "use": "work"} if phone else None,
+            {"system": "email", "value": email, "use": "work"} if email else None,
+        ) if entry]
         
         if telecom:
             fhir_data["telecom"] = telecom
         
         # Qualifications
-        role = (PractitionerMapper.safe_get_attr(practitioner, 'role') or 
-               PractitionerMapper.safe_get_attr(practitioner, 'specialty'))
+        role = (v['role'] or 
+               v['specialty'])
         if role:
             fhir_data["qualification"] = [
                 {
@@ -97,9 +93,5 @@ class PractitionerMapper(FHIRMapper):
         
         return fhir_data
 
-# Registry of all mappers
-FHIR_MAPPERS = {
-    'Patient': PatientMapper.to_fhir,
-    'Practitioner': PractitionerMapper.to_fhir,
-    # Add other mappers here...
-}
\ No newline at end of file
+# Register with the shared mapper registry in mappers.py
+FHIR_MAPPERS['Practitioner'] = PractitionerMapper
\ No newline at end of file
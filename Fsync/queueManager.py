@@ -1,7 +1,42 @@
 from typing import Dict, List, Optional, Any, Tuple
 from .models import SyncQueue, SyncRule
 from django.utils import timezone
+from django.db import transaction
+from django.db.models import Count, prefetch_related_objects
 from django.contrib.contenttypes.models import ContentType
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+import time
+
+# Enabled SyncRule per resource type for the queue_* helpers, so bulk enqueues
+# do not query the same rule for every record. Entries expire after
+# _SYNC_RULE_TTL seconds (rules edited in another process) and are dropped
+# whenever a SyncRule is saved or deleted in this one.
+_SYNC_RULE_TTL = 60
+_sync_rule_cache = {}
+
+# Deferred status writes of retry_failed_items are flushed every this many
+# items, so claimed rows do not sit in 'processing' for the whole run.
+_RETRY_FLUSH_EVERY = 10
+
+
+def _enabled_sync_rule(resource_type: str) -> Optional[SyncRule]:
+    now = time.monotonic()
+    cached = _sync_rule_cache.get(resource_type)
+    if cached is not None and cached[0] > now:
+        return cached[1]
+    sync_rule = SyncRule.objects.filter(
+        resource_type=resource_type,
+        is_enabled=True
+    ).first()
+    _sync_rule_cache[resource_type] = (now + _SYNC_RULE_TTL, sync_rule)
+    return sync_rule
+
+
+@receiver([post_save, post_delete], sender=SyncRule)
+def _clear_sync_rule_cache(sender, **kwargs):
+    _sync_rule_cache.clear()
+
 
 class SyncQueueManager:
     """Manager for sync queue operations"""
@@ -40,9 +75,12 @@ class SyncQueueManager:
             existing.status = 'pending'
             existing.attempts = 0
             existing.error_message = None
+            update_fields = ['fhir_data', 'operation', 'priority', 'status',
+                             'attempts', 'error_message', 'updated_at']
             if sync_rule:
                 existing.sync_rule = sync_rule
-            existing.save()
+                update_fields.append('sync_rule')
+            existing.save(update_fields=update_fields)
             return existing
         else:
             # Create new queue item
@@ -68,10 +106,7 @@ class SyncQueueManager:
     def queue_patient(patient, operation: str = 'create', priority: int = 100) -> SyncQueue:
         """Convenience method to queue a Patient resource"""
         # Find the appropriate sync rule for Patient
-        sync_rule = SyncRule.objects.filter(
-            resource_type='Patient',
-            is_enabled=True
-        ).first()
+        sync_rule = _enabled_sync_rule('Patient')
         
         return SyncQueueManager.queue_resource(
             resource_type='Patient',
@@ -85,10 +120,7 @@ class SyncQueueManager:
     def queue_observation(observation, operation: str = 'create', priority: int = 100) -> SyncQueue:
         """Convenience method to queue an Observation resource"""
         # Find the appropriate sync rule for Observation
-        sync_rule = SyncRule.objects.filter(
-            resource_type='Observation',
-            is_enabled=True
-        ).first()
+        sync_rule = _enabled_sync_rule('Observation')
         
         return SyncQueueManager.queue_resource(
             resource_type='Observation',
@@ -104,10 +136,7 @@ class SyncQueueManager:
     def queue_condition(condition, operation: str = 'create', priority: int = 100) -> SyncQueue:
         """Convenience method to queue a Condition resource"""
         # Find the appropriate sync rule for Condition
-        sync_rule = SyncRule.objects.filter(
-            resource_type='Condition',
-            is_enabled=True
-        ).first()
+        sync_rule = _enabled_sync_rule('Condition')
         
         return SyncQueueManager.queue_resource(
             resource_type='Condition',
@@ -119,59 +148,177 @@ class SyncQueueManager:
         )
     
     @staticmethod
-    def retry_failed_items(max_retries: int = 3) -> Dict[str, int]:
+    def retry_failed_items(max_retries: int = 3, limit: int = 50) -> Dict[str, int]:
         
         from .syncManager import FHIRSyncService
         """Retry failed queue items"""
-        failed_items = SyncQueue.objects.filter(
-            status='failed',
-            attempts__lt=max_retries
-        ).order_by('last_attempt_at')
+        import logging
+
+        logger = logging.getLogger(__name__)
+        sync_service = FHIRSyncService()
+        
+        # Claim up to `limit` failed items with one UPDATE, skipping rows another
+        # worker holds; claimed rows are 'processing' until sync_resource settles them.
+        # Only one item per source object is claimed per run: a claimed sibling
+        # would make FHIRSyncService treat the other as a duplicate.
+        with transaction.atomic():
+            locked_items = list(
+                SyncQueue.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                    status='failed',
+                    attempts__lt=max_retries
+                ).select_related(
+                    'sync_rule', 'content_type'
+                ).order_by('last_attempt_at')[:limit]
+            )
+            failed_items = []
+            claimed_keys = set()
+            for item in locked_items:
+                if item.object_id is not None:
+                    item_key = (item.resource_type, item.object_id)
+                    if item_key in claimed_keys:
+                        continue
+                    claimed_keys.add(item_key)
+                failed_items.append(item)
+            if failed_items:
+                SyncQueue.objects.filter(
+                    pk__in=[item.pk for item in failed_items]
+                ).update(status='processing', updated_at=timezone.now())
+        SyncQueueManager._load_batch_relations(failed_items)
         
         results = {'retried': 0, 'success': 0, 'failed': 0}
-        sync_service = FHIRSyncService()
+        
+        # One item per source object, so status writes and logs need no flush
+        # for duplicates (see process_queue); they are still written every
+        # _RETRY_FLUSH_EVERY items so finished syncs are not left 'processing'
+        # long enough for cleanup_stuck_processing_items to requeue them.
+        sync_service.defer_queue_writes = True
+        dirty_items = []
+        
+        def flush_status_writes():
+            try:
+                SyncQueueManager._write_batch(sync_service, dirty_items)
+            except Exception:
+                logger.exception("Failed to write queue status updates")
+            dirty_items.clear()
         
         for item in failed_items:
-            item.status = 'pending'
-            item.save()
             results['retried'] += 1
+            dirty_items.append(item)
             
             success = sync_service.sync_resource(item)
             if success:
                 results['success'] += 1
             else:
                 results['failed'] += 1
+            
+            if len(dirty_items) >= _RETRY_FLUSH_EVERY:
+                flush_status_writes()
+        
+        flush_status_writes()
         
         return results
     
+    @staticmethod
+    def _load_batch_relations(items):
+        """Load the source objects and share SyncRule instances across a claimed batch"""
+        # Load the source objects with one query per content type instead
+        # of one query per item on first access to item.source_object
+        prefetch_related_objects(items, 'source_object')
+        # select_related builds one SyncRule per row; share one instance per
+        # rule so its merged mappings/transforms/validations are built once
+        sync_rules = {}
+        for item in items:
+            if item.sync_rule_id is not None:
+                item.sync_rule = sync_rules.setdefault(item.sync_rule_id, item.sync_rule)
+    
+    @staticmethod
+    def _write_batch(sync_service, items, refreshed_items=()):
+        """Persist deferred status changes (and refreshed fhir_data) plus buffered sync logs"""
+        import logging
+
+        if not items:
+            return
+        logger = logging.getLogger(__name__)
+        now = timezone.now()
+        for item in items:
+            # bulk_update() bypasses auto_now
+            item.updated_at = now
+        try:
+            with transaction.atomic():
+                # queue_resource re-enqueues an in-flight row by flipping it
+                # back to 'pending' with new fhir_data; only rows still in
+                # 'processing' get this batch's outcome, or the edit is lost
+                in_flight = set(
+                    SyncQueue.objects.select_for_update().filter(
+                        pk__in=[item.pk for item in items],
+                        status='processing'
+                    ).values_list('pk', flat=True)
+                )
+                # The refreshed payload is a batch-time snapshot; a re-enqueued
+                # row already carries newer fhir_data
+                refreshed_items = [item for item in refreshed_items if item.pk in in_flight]
+                if refreshed_items:
+                    SyncQueue.objects.bulk_update(refreshed_items, ['fhir_data'], batch_size=500)
+                SyncQueue.objects.bulk_update(
+                    [item for item in items if item.pk in in_flight],
+                    SyncQueue.STATUS_UPDATE_FIELDS,
+                    batch_size=500
+                )
+                for item in items:
+                    if item.pk not in in_flight:
+                        SyncQueueManager._keep_requeued(item)
+        except Exception:
+            # One bad row must not discard the outcome of the whole batch (a
+            # lost fhir_id would re-POST the resource on the next run), so
+            # fall back to writing the items one by one
+            logger.exception("Bulk queue status update failed, saving items one by one")
+            refreshed_ids = {item.pk for item in refreshed_items}
+            for item in items:
+                update_fields = list(SyncQueue.STATUS_UPDATE_FIELDS)
+                if item.pk in refreshed_ids:
+                    update_fields.append('fhir_data')
+                try:
+                    updated = SyncQueue.objects.filter(pk=item.pk, status='processing').update(
+                        **{field: getattr(item, field) for field in update_fields}
+                    )
+                    if not updated:
+                        SyncQueueManager._keep_requeued(item)
+                except Exception:
+                    logger.exception(f"Failed to save status of queue item {item.id}")
+        sync_service.flush_logs()
+    
+    @staticmethod
+    def _keep_requeued(item):
+        """Leave a row re-enqueued during its sync pending, but keep a newly created fhir_id"""
+        # Without the id the pending update of the row would have no
+        # resource to target and the next run would POST it again
+        if item.status == 'success' and item.fhir_id:
+            SyncQueue.objects.filter(pk=item.pk, fhir_id__isnull=True).update(fhir_id=item.fhir_id)
+    
     @staticmethod
     def get_statistics() -> Dict[str, Any]:
         """Get queue statistics"""
-        stats = {}
-        
-        # Overall stats
-        stats['total'] = SyncQueue.objects.count()
-        stats['pending'] = SyncQueue.objects.filter(status='pending').count()
-        stats['processing'] = SyncQueue.objects.filter(status='processing').count()
-        stats['success'] = SyncQueue.objects.filter(status='success').count()
-        stats['failed'] = SyncQueue.objects.filter(status='failed').count()
-        
-        # By resource type
-        stats['by_resource_type'] = {}
-        for resource_type, _ in SyncRule.RESOURCE_TYPES:
-            type_stats = {
-                'pending': SyncQueue.objects.filter(
-                    resource_type=resource_type, status='pending'
-                ).count(),
-                'success': SyncQueue.objects.filter(
-                    resource_type=resource_type, status='success'
-                ).count(),
-                'failed': SyncQueue.objects.filter(
-                    resource_type=resource_type, status='failed'
-                ).count(),
-            }
+        # One GROUP BY query over (resource_type, status), pivoted in Python
+        stats = {'total': 0, 'pending': 0, 'processing': 0, 'success': 0, 'failed': 0}
+        
+        # By resource type (pending/success/failed; their sum is the type total)
+        by_resource_type = {
+            resource_type: {'pending': 0, 'success': 0, 'failed': 0}
+            for resource_type, _ in SyncRule.RESOURCE_TYPES
+        }
+        
+        counts = SyncQueue.objects.order_by().values_list('resource_type', 'status').annotate(count=Count('id'))
+        for resource_type, status, count in counts:
+            stats['total'] += count
+            if status in stats:
+                stats[status] += count
+            type_stats = by_resource_type.get(resource_type)
+            if type_stats is not None and status in type_stats:
+                type_stats[status] = count
+        
+        for type_stats in by_resource_type.values():
             type_stats['total'] = sum(type_stats.values())
-            stats['by_resource_type'][resource_type] = type_stats
+        stats['by_resource_type'] = by_resource_type
         
         return stats
     
@@ -189,19 +336,62 @@ class SyncQueueManager:
             logger.error(f"Failed to initialize sync service: {e}")
             return {'success': 0, 'failed': 0, 'total': 0, 'error': str(e)}
 
-        # Get pending items
+        # Claim pending items. Rows locked by a concurrent worker are skipped,
+        # and claimed rows are flipped to 'processing' before the lock is
+        # released so no other worker picks them up during the sync calls.
+        # Rows left behind by a crashed worker are reset by
+        # cleanup_stuck_processing_items.
         try:
-            pending_items = SyncQueue.objects.filter(
-                status='pending',
-                scheduled_at__lte=timezone.now()
-            ).order_by('priority', 'created_at')[:limit]
+            now = timezone.now()
+            with transaction.atomic():
+                # of=('self',): only lock queue rows; the joined relations are
+                # nullable and PostgreSQL cannot lock the outer side of a join
+                pending_items = list(
+                    SyncQueue.objects.select_for_update(skip_locked=True, of=('self',)).filter(
+                        status='pending',
+                        scheduled_at__lte=now
+                    ).select_related(
+                        'sync_rule', 'content_type'
+                    ).order_by('priority', 'created_at')[:limit]
+                )
+                if pending_items:
+                    SyncQueue.objects.filter(
+                        pk__in=[item.pk for item in pending_items]
+                    ).update(status='processing', updated_at=now)
+            SyncQueueManager._load_batch_relations(pending_items)
         except Exception as e:
             logger.error(f"Failed to fetch pending items: {e}")
             return {'success': 0, 'failed': 0, 'total': 0, 'error': str(e)}
 
         results = {'success': 0, 'failed': 0, 'total': len(pending_items)}
 
+        # Status changes are collected in memory and written with one bulk_update
+        # per batch. Items for an object already touched in this batch force a
+        # flush first, because the duplicate checks in FHIRSyncService query the
+        # database state of sibling items for the same object.
+        # Refreshed Patient fhir_data is written the same way.
+        sync_service.defer_queue_writes = True
+        dirty_items = []
+        dirty_keys = set()
+        refreshed_items = []
+
+        def flush_status_writes():
+            # Sync logs of the batch are buffered by the service as well
+            try:
+                SyncQueueManager._write_batch(sync_service, dirty_items, refreshed_items)
+            except Exception:
+                logger.exception("Failed to write queue status updates")
+            dirty_items.clear()
+            dirty_keys.clear()
+            refreshed_items.clear()
+
         for item in pending_items:
+            item_key = (item.resource_type, item.object_id)
+            if item_key in dirty_keys:
+                flush_status_writes()
+            dirty_items.append(item)
+            dirty_keys.add(item_key)
+
             try:
                 # Check if this is a Patient resource and ensure fhir_data is properly populated
                 if item.resource_type == 'Patient' and item.source_object:
@@ -209,11 +399,11 @@ class SyncQueueManager:
                         # Refresh the fhir_data from the source object
                         if hasattr(item.source_object, 'to_fhir_dict'):
                             item.fhir_data = item.source_object.to_fhir_dict()
-                            item.save(update_fields=['fhir_data'])
+                            refreshed_items.append(item)
                             logger.info(f"Refreshed FHIR data for queue item {item.id}")
                     except Exception as e:
                         logger.error(f"Failed to refresh FHIR data for item {item.id}: {e}")
-                        item.mark_failed(f"Failed to refresh FHIR data: {e}")
+                        item.mark_failed(f"Failed to refresh FHIR data: {e}", commit=False)
                         results['failed'] += 1
                         continue
 
@@ -226,10 +416,9 @@ class SyncQueueManager:
 
             except Exception as e:
                 logger.error(f"Exception processing queue item {item.id}: {e}")
-                try:
-                    item.mark_failed(f"Processing exception: {e}")
-                except Exception as mark_error:
-                    logger.error(f"Failed to mark item as failed: {mark_error}")
+                item.mark_failed(f"Processing exception: {e}", commit=False)
                 results['failed'] += 1
 
-        return results
\ No newline at end of file
+        flush_status_writes()
+
+        return results
@@ -2,6 +2,7 @@
 
 #import requests
 #import json
+import functools
 import logging
 from typing import Dict, List, Any, Tuple
 from django.utils import timezone
@@ -15,6 +16,28 @@ base_url = FHIR_SERVER_BASE_URL
 
 logger = logging.getLogger(__name__)
 
+
+@functools.lru_cache(maxsize=1024)
+def _parse_field_path(path: str) -> Tuple[Tuple[str, Any], ...]:
+    """
+    Split a field mapping path such as 'name[0].given[1]' or
+    'identifier[mrn].value' into (key, index) segments. index is None for a
+    plain key, an int for a numeric index and a str for a named index.
+    
+    Sync rules reuse the same few dozen paths for every record, so each path
+    is parsed once per process.
+    """
+    segments = []
+    for key in path.split('.'):
+        if '[' in key and ']' in key:
+            key, index = key.split('[', 1)
+            index = index.rstrip(']')
+            segments.append((key, int(index) if index.isdigit() else index))
+        else:
+            segments.append((key, None))
+    return tuple(segments)
+
+
 class FHIRDataMapper:
     """Handles field mapping and transformation between HMS and FHIR formats"""
     
@@ -30,63 +53,79 @@ class FHIRDataMapper:
         
         return fhir_data
     
+    @staticmethod
+    def map_and_transform(source_data: Dict, field_mappings: Dict, transform_rules: Dict) -> Dict:
+        """
+        Map HMS data to FHIR format, applying transformation rules on the way.
+        
+        Produces the same document as apply_field_mappings followed by
+        rewriting every mapped path with its apply_transformations value,
+        without building the transformed copy of the whole source record.
+        Both passes are kept: list elements are created in the order of the
+        first (non-None values, mapping order) and the second (all mapped
+        values, source order) pass, and named-index paths are appended by each.
+        """
+        fhir_data = {}
+        set_value = FHIRDataMapper._set_nested_value
+        transform_value = FHIRDataMapper._transform_value
+        
+        for hms_field, fhir_path in field_mappings.items():
+            value = source_data.get(hms_field)
+            if value is not None:
+                set_value(fhir_data, fhir_path, value)
+        
+        for hms_field, value in source_data.items():
+            if hms_field not in field_mappings:
+                continue
+            if value is not None:
+                rule = transform_rules.get(hms_field)
+                if rule is not None:
+                    value = transform_value(value, rule)
+            set_value(fhir_data, field_mappings[hms_field], value)
+        
+        return fhir_data
+    
     @staticmethod
     def _set_nested_value(data: Dict, path: str, value: Any):
         """Set a nested value in a dictionary using dot notation"""
-        keys = path.split('.')
+        *parents, (final_key, final_index) = _parse_field_path(path)
         current = data
         
-        for key in keys[:-1]:
+        for key, index in parents:
             # Handle array notation like 'name[0]' or 'identifier[mrn]'
-            if '[' in key and ']' in key:
-                array_key, index_part = key.split('[', 1)
-                index = index_part.rstrip(']')
-                
-                if array_key not in current:
-                    current[array_key] = []
-                
-                # Handle numeric indices
-                if index.isdigit():
-                    idx = int(index)
-                    while len(current[array_key]) <= idx:
-                        current[array_key].append({})
-                    current = current[array_key][idx]
-                else:
-                    # Handle named indices (for identifier types, etc.)
-                    found = False
-                    for item in current[array_key]:
-                        if isinstance(item, dict) and item.get('type') == index:
-                            current = item
-                            found = True
-                            break
-                    
-                    if not found:
-                        new_item = {'type': index}
-                        current[array_key].append(new_item)
-                        current = new_item
-            else:
+            if index is None:
                 if key not in current:
                     current[key] = {}
                 current = current[key]
-        
-        # Set the final value
-        final_key = keys[-1]
-        if '[' in final_key and ']' in final_key:
-            array_key, index_part = final_key.split('[', 1)
-            index = index_part.rstrip(']')
-            
-            if array_key not in current:
-                current[array_key] = []
+                continue
             
-            if index.isdigit():
-                idx = int(index)
-                while len(current[array_key]) <= idx:
-                    current[array_key].append(None)
-                current[array_key][idx] = value
+            items = current.setdefault(key, [])
+            if isinstance(index, int):
+                while len(items) <= index:
+                    items.append({})
+                current = items[index]
             else:
-                current[array_key].append(value)
-        else:
+                # Handle named indices (for identifier types, etc.)
+                for item in items:
+                    if isinstance(item, dict) and item.get('type') == index:
+                        current = item
+                        break
+                else:
+                    current = {'type': index}
+                    items.append(current)
+        
+        # Set the final value
+        if final_index is None:
             current[final_key] = value
+            return
+        
+        items = current.setdefault(final_key, [])
+        if isinstance(final_index, int):
+            while len(items) <= final_index:
+                items.append(None)
+            items[final_index] = value
+        else:
+            items.append(value)
     
     @staticmethod
     def apply_transformations(data: Dict, transform_rules: Dict) -> Dict:
@@ -6,6 +6,7 @@ from django.contrib.contenttypes.models import ContentType
 from .models import SyncRule, SyncQueue
 from .services import SyncQueueManager
 from .mappers import FHIR_MAPPERS
+from . import practitionerMapper  # registers the Practitioner mapper in FHIR_MAPPERS
 import logging
 
 logger = logging.getLogger(__name__)
@@ -74,14 +75,14 @@ def handle_instance_save(sender, instance, created):
         
         for rule in sync_rules:
             try:
-                # Get the mapper function
-                mapper_func = FHIR_MAPPERS.get(rule.resource_type)
-                if not mapper_func:
+                # Get the mapper class
+                mapper = FHIR_MAPPERS.get(rule.resource_type)
+                if not mapper:
                     logger.warning(f"No mapper found for {rule.resource_type}")
                     continue
                 
                 # Generate FHIR data
-                fhir_data = mapper_func(instance)
+                fhir_data = mapper.to_fhir(instance)
                 operation = 'create' if created else 'update'
                 
                 # Get appropriate resource ID
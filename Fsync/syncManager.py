@@ -3,6 +3,7 @@ import logging
 from Fsync.models import SyncLog
 from core import settings
 from .services import FHIRDataMapper, FHIRDataValidator
+from .mappers import dumps_fhir
 from django.utils import timezone
 from typing import Dict, Any, Tuple
 from .models import SyncQueue, FHIRSyncConfig
@@ -18,7 +19,7 @@ class FHIRSyncService:
         """
         try:
             # Mark as processing
-            queue_item.mark_processing()
+            queue_item.mark_processing(commit=self._commit_queue_writes)
             
             # Check if we have a sync rule
             if queue_item.sync_rule:
@@ -28,7 +29,7 @@ class FHIRSyncService:
                 
         except Exception as e:
             error_msg = f"Sync failed: {str(e)}"
-            queue_item.mark_failed(error_msg)
+            queue_item.mark_failed(error_msg, commit=self._commit_queue_writes)
             self._log_sync_event(queue_item, 'ERROR', error_msg)
             return False
     
@@ -48,6 +49,16 @@ class FHIRSyncService:
             
         self.session = requests.Session()
         self._setup_authentication()
+        
+        # When True, status changes on the item being synced are kept in memory
+        # and the caller persists them (see SyncQueueManager.process_queue)
+        self.defer_queue_writes = False
+        # SyncLog rows buffered while defer_queue_writes is set (see flush_logs)
+        self.pending_logs = []
+    
+    @property
+    def _commit_queue_writes(self) -> bool:
+        return not self.defer_queue_writes
 
     def _setup_authentication(self):
         """Setup authentication for FHIR requests"""
@@ -112,7 +123,8 @@ class FHIRSyncService:
             
             queue_item.mark_success(
                 fhir_id=existing_success.fhir_id,
-                response_data=existing_success.response_data
+                response_data=existing_success.response_data,
+                commit=self._commit_queue_writes
             )
             
             # Update source object with existing FHIR ID if it's a Patient
@@ -142,7 +154,8 @@ class FHIRSyncService:
             
             # Mark as failed with a clear message about being a duplicate
             queue_item.mark_failed(
-                f"Duplicate sync item - object_id {queue_item.object_id} already being processed by item {existing_pending.id}"
+                f"Duplicate sync item - object_id {queue_item.object_id} already being processed by item {existing_pending.id}",
+                commit=self._commit_queue_writes
             )
             
             self._log_sync_event(
@@ -159,7 +172,7 @@ class FHIRSyncService:
         try:
             response = self.session.post(
                 url, 
-                json=fhir_data, 
+                data=dumps_fhir(fhir_data), 
                 timeout=getattr(self.config, 'timeout', 30)
             )
             
@@ -170,12 +183,12 @@ class FHIRSyncService:
                 if not fhir_id:
                     # FHIR server didn't return an ID - this is an error
                     error_msg = "FHIR server response missing 'id' field"
-                    queue_item.mark_failed(error_msg, response_data=response_data)
+                    queue_item.mark_failed(error_msg, response_data=response_data, commit=self._commit_queue_writes)
                     self._log_sync_event(queue_item, 'ERROR', error_msg)
                     return False
                 
                 # Mark current item as success
-                queue_item.mark_success(fhir_id=fhir_id, response_data=response_data)
+                queue_item.mark_success(fhir_id=fhir_id, response_data=response_data, commit=self._commit_queue_writes)
                 
                 # Update source object with FHIR ID if it's a Patient
                 if queue_item.source_object and queue_item.resource_type == 'Patient':
@@ -190,13 +203,13 @@ class FHIRSyncService:
                 
             else:
                 error_msg = f"HTTP {response.status_code}: {response.text[:500]}"
-                queue_item.mark_failed(error_msg, response_data={'status_code': response.status_code})
+                queue_item.mark_failed(error_msg, response_data={'status_code': response.status_code}, commit=self._commit_queue_writes)
                 self._log_sync_event(queue_item, 'ERROR', error_msg)
                 return False
                 
         except Exception as e:
             error_msg = f"Request failed: {str(e)}"
-            queue_item.mark_failed(error_msg)
+            queue_item.mark_failed(error_msg, commit=self._commit_queue_writes)
             self._log_sync_event(queue_item, 'ERROR', error_msg)
         return False
 
@@ -245,20 +258,10 @@ class FHIRSyncService:
             # Extract data from source object
             source_data.update(self._extract_model_data(queue_item.source_object))
         
-        # Apply field mappings
+        # Apply field mappings and transformations in one pass
         field_mappings = sync_rule.get_effective_field_mappings()
-        mapped_data = FHIRDataMapper.apply_field_mappings(source_data, field_mappings)
-        
-        # Apply transformations
         transform_rules = sync_rule.get_transform_rules()
-        transformed_data = FHIRDataMapper.apply_transformations(source_data, transform_rules)
-        
-        # Merge transformed data into mapped FHIR data
-        fhir_data = {**mapped_data}
-        for key, value in transformed_data.items():
-            if key in field_mappings:
-                fhir_path = field_mappings[key]
-                FHIRDataMapper._set_nested_value(fhir_data, fhir_path, value)
+        fhir_data = FHIRDataMapper.map_and_transform(source_data, field_mappings, transform_rules)
         
         # Validate data
         validation_rules = sync_rule.get_validation_rules()
@@ -266,9 +269,8 @@ class FHIRSyncService:
         
         if not is_valid:
             error_msg = f"Validation failed: {'; '.join(validation_errors)}"
-            queue_item.mark_failed(error_msg)
             queue_item.validation_results = {'valid': False, 'errors': validation_errors}
-            queue_item.save()
+            queue_item.mark_failed(error_msg, commit=self._commit_queue_writes)
             self._log_sync_event(queue_item, 'ERROR', error_msg)
             return False
         
@@ -276,7 +278,8 @@ class FHIRSyncService:
         queue_item.field_mapping_used = field_mappings
         queue_item.transform_applied = transform_rules
         queue_item.validation_results = {'valid': True, 'errors': []}
-        queue_item.save()
+        if self._commit_queue_writes:
+            queue_item.save()
         
         # Ensure required FHIR fields
         if 'resourceType' not in fhir_data:
@@ -496,13 +499,13 @@ class FHIRSyncService:
         
         response = self.session.put(
             url, 
-            json=fhir_data, 
+            data=dumps_fhir(fhir_data), 
             timeout=getattr(self.config, 'timeout', 30)
         )
         
         if response.status_code in [200, 201]:
             response_data = response.json()
-            queue_item.mark_success(fhir_id=fhir_id, response_data=response_data)
+            queue_item.mark_success(fhir_id=fhir_id, response_data=response_data, commit=self._commit_queue_writes)
             
             # Update source object sync timestamp
             if queue_item.source_object and queue_item.resource_type == 'Patient':
@@ -515,7 +518,7 @@ class FHIRSyncService:
             return self._create_resource(queue_item, fhir_data)
         else:
             error_msg = f"HTTP {response.status_code}: {response.text[:500]}"
-            queue_item.mark_failed(error_msg, response_data={'status_code': response.status_code})
+            queue_item.mark_failed(error_msg, response_data={'status_code': response.status_code}, commit=self._commit_queue_writes)
             self._log_sync_event(queue_item, 'ERROR', error_msg)
             return False
     
@@ -523,7 +526,7 @@ class FHIRSyncService:
         """Delete FHIR resource"""
         fhir_id = queue_item.fhir_id
         if not fhir_id:
-            queue_item.mark_failed("No FHIR ID available for deletion")
+            queue_item.mark_failed("No FHIR ID available for deletion", commit=self._commit_queue_writes)
             return False
         
         url = f"{self.base_url}/{queue_item.resource_type}/{fhir_id}"
@@ -534,17 +537,17 @@ class FHIRSyncService:
         )
         
         if response.status_code in [200, 204]:
-            queue_item.mark_success()
+            queue_item.mark_success(commit=self._commit_queue_writes)
             self._log_sync_event(queue_item, 'INFO', f"Resource deleted: {fhir_id}")
             return True
         elif response.status_code == 404:
             # Already deleted
-            queue_item.mark_success()
+            queue_item.mark_success(commit=self._commit_queue_writes)
             self._log_sync_event(queue_item, 'INFO', f"Resource already deleted: {fhir_id}")
             return True
         else:
             error_msg = f"HTTP {response.status_code}: {response.text[:500]}"
-            queue_item.mark_failed(error_msg, response_data={'status_code': response.status_code})
+            queue_item.mark_failed(error_msg, response_data={'status_code': response.status_code}, commit=self._commit_queue_writes)
             self._log_sync_event(queue_item, 'ERROR', error_msg)
             return False
     
@@ -569,12 +572,23 @@ class FHIRSyncService:
     
     def _log_sync_event(self, queue_item: SyncQueue, level: str, message: str, details: Dict = None):
         """Log sync event"""
-        SyncLog.objects.create(
+        log = SyncLog(
             queue_item=queue_item,
             level=level,
             message=message,
             details=details or {}
         )
+        if self.defer_queue_writes:
+            self.pending_logs.append(log)
+        else:
+            log.save()
+    
+    def flush_logs(self):
+        """Insert the buffered SyncLog rows with one bulk INSERT"""
+        if not self.pending_logs:
+            return
+        SyncLog.objects.bulk_create(self.pending_logs, batch_size=1000)
+        self.pending_logs.clear()
 
     def check_server_availability(self) -> bool:
         """
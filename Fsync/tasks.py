@@ -31,7 +31,6 @@ from django.apps import apps
 from django.db import transaction
 from django.core.exceptions import ObjectDoesNotExist
 from requests.exceptions import ConnectionError, RequestException
-import traceback
 from .tasksUtils import get_resource_id, validate_fhir_data
 logger = logging.getLogger(__name__)
 
@@ -76,8 +75,7 @@ def process_sync_queue_task(self, limit=50):
         raise self.retry(countdown=300, exc=e)  # Wait 5 minutes before retry
     except Exception as e:
         # General errors - retry with shorter delay
-        logger.error(f"Sync queue processing failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"Sync queue processing failed: {e}")
         raise self.retry(countdown=60, exc=e)
 
 @shared_task(bind=True, max_retries=3)
@@ -165,15 +163,13 @@ def full_sync_task(self, resource_types=None):
                         
                     except Exception as e:
                         # Log individual record errors but continue processing
-                        logger.error(f"Failed to queue {rule.resource_type} {get_resource_id(record)}: {e}")
-                        logger.error(f"Traceback: {traceback.format_exc()}")
+                        logger.exception(f"Failed to queue {rule.resource_type} {get_resource_id(record)}: {e}")
                         total_errors += 1
                         continue
                         
             except Exception as e:
                 # Log rule-level errors but continue with other rules
-                logger.error(f"Error processing sync rule {rule}: {e}")
-                logger.error(f"Traceback: {traceback.format_exc()}")
+                logger.exception(f"Error processing sync rule {rule}: {e}")
                 total_errors += 1
                 continue
         
@@ -196,8 +192,7 @@ def full_sync_task(self, resource_types=None):
         raise self.retry(countdown=300, exc=e)  # Wait 5 minutes
     except Exception as e:
         # General errors during full sync
-        logger.error(f"Full sync failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"Full sync failed: {e}")
         raise self.retry(countdown=300, exc=e)
 
 @shared_task
@@ -225,8 +220,7 @@ def retry_failed_syncs_task():
         logger.info(f"Retried {results['retried']} failed items")
         return results
     except Exception as e:
-        logger.error(f"Retry failed syncs error: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"Retry failed syncs error: {e}")
         return {'error': str(e)}
 
 # ============================================================================
@@ -296,8 +290,7 @@ def sync_patient_task(patient_id, operation='update'):
         logger.error(f"Connection error during patient sync: {e}")
         return {'error': f'Connection error: {str(e)}'}
     except Exception as e:
-        logger.error(f"Patient sync failed: {e}")
-        logger.error(f"Traceback: {traceback.format_exc()}")
+        logger.exception(f"Patient sync failed: {e}")
         return {'error': str(e)}
 
 # ============================================================================
@@ -816,14 +809,15 @@ def queue_missing_practitioners():
             try:
                 practitioner = Practitioner.objects.get(id=practitioner_id)
                 
-                # Build FHIR data for practitioner
+                # Build FHIR data for practitioner (last word is the family name)
+                head, _, last = practitioner.name.strip().rpartition(' ')
                 fhir_data = {
                     "resourceType": "Practitioner",
                     "active": True,
                     "name": [{
                         "text": practitioner.name,
-                        "family": practitioner.name.split()[-1] if ' ' in practitioner.name else practitioner.name,
-                        "given": practitioner.name.split()[:-1] if ' ' in practitioner.name else [practitioner.name]
+                        "family": last if head else practitioner.name,
+                        "given": head.split() if head else [practitioner.name]
                     }]
                 }
                 
@@ -2664,12 +2658,12 @@ def queue_new_practitioners():
                 # Add name
                 if practitioner.name:
                     # Parse name into family/given components
-                    name_parts = practitioner.name.strip().split()
-                    if len(name_parts) >= 2:
+                    head, _, last = practitioner.name.strip().rpartition(' ')
+                    if head:
                         fhir_data["name"] = [{
                             "use": "official",
-                            "family": name_parts[-1],  # Last part is family name
-                            "given": name_parts[:-1],  # Everything else is given names
+                            "family": last,  # Last part is family name
+                            "given": head.split(),  # Everything else is given names
                             "text": practitioner.name
                         }]
                     else:
@@ -1,3 +1,192 @@
-from django.test import TestCase
+from datetime import datetime, time, timedelta
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from .maintenanceUtils import drop_expired_synclog_partitions, ensure_synclog_partitions, _next_month
+from .models import SyncLog, SyncQueue
+from .queueManager import SyncQueueManager
+from .services import FHIRDataMapper
+from .syncManager import FHIRSyncService
+
+
+@override_settings(FHIR_SERVER_BASE_URL='http://fhir.test/fhir')
+class ProcessQueueRequeueTests(TestCase):
+    """Items re-enqueued by queue_resource while their batch is in flight"""
+
+    def setUp(self):
+        self.item = SyncQueue.objects.create(
+            resource_type='Observation',
+            resource_id='obs-1',
+            fhir_data={'resourceType': 'Observation', 'status': 'preliminary'},
+        )
+
+    def _sync_and_edit(self, service, queue_item):
+        # The source is edited (and re-enqueued) after the row was claimed
+        SyncQueueManager.queue_resource(
+            resource_type='Observation',
+            resource_id='obs-1',
+            fhir_data={'resourceType': 'Observation', 'status': 'final'},
+            operation='update',
+        )
+        queue_item.mark_success(fhir_id='fhir-1', commit=service._commit_queue_writes)
+        return True
+
+    def test_edit_during_batch_stays_pending(self):
+        with mock.patch.object(FHIRSyncService, 'sync_resource', autospec=True,
+                               side_effect=self._sync_and_edit):
+            SyncQueueManager.process_queue()
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'pending')
+        self.assertEqual(self.item.operation, 'update')
+        self.assertEqual(self.item.fhir_data['status'], 'final')
+        # The created resource id is kept for the pending update
+        self.assertEqual(self.item.fhir_id, 'fhir-1')
+
+    def test_unchanged_item_gets_batch_outcome(self):
+        def sync(service, queue_item):
+            queue_item.mark_success(fhir_id='fhir-1', commit=service._commit_queue_writes)
+            return True
+
+        with mock.patch.object(FHIRSyncService, 'sync_resource', autospec=True, side_effect=sync):
+            results = SyncQueueManager.process_queue()
+
+        self.assertEqual(results['success'], 1)
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'success')
+        self.assertEqual(self.item.fhir_id, 'fhir-1')
+
+    def test_refreshed_data_does_not_overwrite_requeued_data(self):
+        SyncQueue.objects.filter(pk=self.item.pk).update(status='processing')
+        item = SyncQueue.objects.get(pk=self.item.pk)
+        # Snapshot taken when the batch refreshed the payload
+        item.fhir_data = {'resourceType': 'Observation', 'status': 'amended'}
+        item.mark_success(fhir_id='fhir-1', commit=False)
+        SyncQueueManager.queue_resource(
+            resource_type='Observation',
+            resource_id='obs-1',
+            fhir_data={'resourceType': 'Observation', 'status': 'final'},
+            operation='update',
+        )
+
+        service = mock.Mock(spec=FHIRSyncService)
+        SyncQueueManager._write_batch(service, [item], [item])
+
+        self.item.refresh_from_db()
+        self.assertEqual(self.item.status, 'pending')
+        self.assertEqual(self.item.fhir_data['status'], 'final')
+        service.flush_logs.assert_called_once_with()
+
+
+@skipUnless(connection.vendor == 'postgresql', 'SyncLog partitioning requires PostgreSQL')
+class SyncLogPartitionTests(TestCase):
+    """Monthly SyncLog partitions (migration 0004)"""
+
+    def setUp(self):
+        self.table = SyncLog._meta.db_table
+        self.queue_item = SyncQueue.objects.create(
+            resource_type='Observation', resource_id='obs-1', fhir_data={}
+        )
+
+    def _log(self, level, month):
+        stamp = timezone.make_aware(datetime.combine(month + timedelta(days=10), time()))
+        return SyncLog.objects.create(
+            queue_item=self.queue_item, level=level, message=level, timestamp=stamp
+        )
+
+    def _count(self, table, pk):
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM "{table}" WHERE "id" = %s', [pk])
+            return cursor.fetchone()[0]
+
+    def test_ensure_moves_rows_out_of_default_partition(self):
+        month = _next_month(timezone.now().date().replace(day=1))
+        name = f"{self.table}_p{month:%Y%m}"
+        with connection.cursor() as cursor:
+            cursor.execute(f'DROP TABLE IF EXISTS "{name}"')
+        log = self._log('WARNING', month)
+        self.assertEqual(self._count(f"{self.table}_default", log.pk), 1)
+
+        result = ensure_synclog_partitions()
+
+        self.assertIn(name, result['created'])
+        self.assertEqual(self._count(name, log.pk), 1)
+        self.assertEqual(self._count(f"{self.table}_default", log.pk), 0)
+
+    def test_drop_keeps_warning_and_error_rows(self):
+        month = timezone.now().date().replace(day=1, year=timezone.now().year - 2)
+        name = f"{self.table}_p{month:%Y%m}"
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TABLE "{name}" PARTITION OF "{self.table}" '
+                f"FOR VALUES FROM ('{month:%Y-%m-%d}') TO ('{_next_month(month):%Y-%m-%d}')"
+            )
+        info = self._log('INFO', month)
+        warning = self._log('WARNING', month)
+        error = self._log('ERROR', month)
+
+        dropped = drop_expired_synclog_partitions(timezone.now() - timedelta(days=30))
+
+        self.assertGreaterEqual(dropped, 1)
+        self.assertFalse(SyncLog.objects.filter(pk=info.pk).exists())
+        self.assertEqual(
+            set(SyncLog.objects.filter(pk__in=[warning.pk, error.pk]).values_list('level', flat=True)),
+            {'WARNING', 'ERROR'}
+        )
+        self.assertEqual(self._count(f"{self.table}_default", error.pk), 1)
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT to_regclass(%s)', [f'"{name}"'])
+            self.assertIsNone(cursor.fetchone()[0])
+
+
+class MapAndTransformTests(SimpleTestCase):
+    """map_and_transform must match the old mapping + transformation passes"""
+
+    field_mappings = {
+        'secondary_phone': 'telecom[1].value',
+        'primary_phone': 'telecom[0].value',
+        'middle_name': 'name[0].given[1]',
+        'first_name': 'name[0].given[0]',
+        'national_id': 'identifier[ssn].value',
+        'gender': 'gender',
+    }
+    transform_rules = {
+        'primary_phone': {'type': 'phone_format'},
+        'gender': {'type': 'map', 'mapping': {'M': 'male'}},
+    }
+
+    def _two_pass(self, source_data):
+        mapped_data = FHIRDataMapper.apply_field_mappings(source_data, self.field_mappings)
+        transformed_data = FHIRDataMapper.apply_transformations(source_data, self.transform_rules)
+        fhir_data = {**mapped_data}
+        for key, value in transformed_data.items():
+            if key in self.field_mappings:
+                FHIRDataMapper._set_nested_value(fhir_data, self.field_mappings[key], value)
+        return fhir_data
+
+    def test_missing_values_keep_two_pass_output(self):
+        source_data = {
+            'first_name': 'Ama',
+            'middle_name': None,
+            'primary_phone': '0244123456',
+            'secondary_phone': None,
+            'national_id': None,
+            'gender': 'M',
+        }
+
+        fhir_data = FHIRDataMapper.map_and_transform(
+            source_data, self.field_mappings, self.transform_rules
+        )
+
+        self.assertEqual(repr(fhir_data), repr(self._two_pass(source_data)))
+        self.assertEqual(fhir_data, {
+            'telecom': [{'value': '+2330244123456'}, {'value': None}],
+            'name': [{'given': ['Ama', None]}],
+            'gender': 'male',
+            'identifier': [{'type': 'ssn', 'value': None}],
+        })
+        # Paths of missing values are only created by the second pass
+        self.assertEqual(list(fhir_data), ['telecom', 'name', 'gender', 'identifier'])
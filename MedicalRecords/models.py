@@ -3,6 +3,15 @@ from django.db import models
 from django.utils import timezone
 from Patients.models import Patient
 
+# Shared Observation category; the FHIR dict is serialized, never mutated in place
+_VITAL_SIGNS_CATEGORY = [{
+    "coding": [{
+        "system": "http://terminology.hl7.org/CodeSystem/observation-category",
+        "code": "vital-signs",
+        "display": "Vital Signs"
+    }]
+}]
+
 
 class Encounter(models.Model):
     patient = models.ForeignKey(Patient, on_delete=models.CASCADE)
@@ -94,13 +103,7 @@ class Observation(models.Model):
             "status": self.status,
             
             # Add required category field
-            "category": [{
-                "coding": [{
-                    "system": "http://terminology.hl7.org/CodeSystem/observation-category",
-                    "code": "vital-signs",
-                    "display": "Vital Signs"
-                }]
-            }],
+            "category": _VITAL_SIGNS_CATEGORY,
             
             # Code with proper LOINC system
             "code": {
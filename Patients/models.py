@@ -6,6 +6,68 @@ from datetime import date
 import uuid
 from encrypted_model_fields.fields import EncryptedCharField, EncryptedTextField, EncryptedEmailField
 
+# FHIR v3-MaritalStatus codes for the Patient.marital_status choices
+_MARITAL_STATUS_CODES = {
+    "single": "S",
+    "married": "M",
+    "divorced": "D",
+    "widowed": "W",
+    "separated": "L"
+}
+
+# Shared CodeableConcepts for to_fhir_dict. The FHIR dict is only read and
+# serialized, never mutated in place, so these are not rebuilt per patient.
+_MR_IDENTIFIER_TYPE = {
+    "coding": [{
+        "system": "http://terminology.hl7.org/CodeSystem/v2-0203",
+        "code": "MR",
+        "display": "Medical Record Number"
+    }]
+}
+_SB_IDENTIFIER_TYPE = {
+    "coding": [{
+        "system": "http://terminology.hl7.org/CodeSystem/v2-0203",
+        "code": "SB",
+        "display": "Social Beneficiary Identifier"
+    }]
+}
+_MARITAL_STATUS_CONCEPTS = {
+    status: {
+        "coding": [{
+            "system": "http://terminology.hl7.org/CodeSystem/v3-MaritalStatus",
+            "code": code,
+            "display": status.title()
+        }]
+    }
+    for status, code in _MARITAL_STATUS_CODES.items()
+}
+
+# (field, entry template) for the Patient telecom entries, in output order
+_TELECOM_SPEC = (
+    ('primary_phone', {"system": "phone", "use": "home"}),
+    ('secondary_phone', {"system": "phone", "use": "work"}),
+    ('email', {"system": "email", "use": "home"}),
+)
+
+# (field, FHIR value key, formatter, StructureDefinition URL) for the
+# single-value Patient extensions, in output order
+_EXTENSION_SPEC = (
+    ('last_arrived', 'valueDate', date.isoformat,
+     "http://example.org/fhir/StructureDefinition/last-arrived"),
+    ('blood_type', 'valueString', None,
+     "http://example.org/fhir/StructureDefinition/blood-type"),
+    ('allergies', 'valueString', None,
+     "http://example.org/fhir/StructureDefinition/allergies"),
+)
+
+
+def _add_extension(extensions, entry):
+    """Append entry to extensions, creating the list on first use"""
+    if extensions is None:
+        return [entry]
+    extensions.append(entry)
+    return extensions
+
 
 def clean_encrypted_value(value):
     """
@@ -309,43 +371,26 @@ class Patient(models.Model):
         }
         
         # === IDENTIFIERS - Fixed structure ===
-        identifiers = []
-        
-        # Primary identifier (MRN/Patient ID)
+        # Primary identifier (MRN/Patient ID), then National ID as additional identifier
         primary_id = self.get_primary_identifier()
-        if primary_id:
-            identifiers.append({
+        national_id = self.get_encrypted_field('national_id')
+        identifiers = [identifier for identifier in (
+            {
                 "use": "usual",
-                "type": {
-                    "coding": [{
-                        "system": "http://terminology.hl7.org/CodeSystem/v2-0203", 
-                        "code": "MR",
-                        "display": "Medical Record Number"
-                    }]
-                },
+                "type": _MR_IDENTIFIER_TYPE,
                 "value": primary_id
-            })
-        
-        # National ID as additional identifier
-        national_id = self.get_encrypted_field('national_id')
-        if national_id and national_id != primary_id:
-            identifiers.append({
+            } if primary_id else None,
+            {
                 "use": "official",
-                "type": {
-                    "coding": [{
-                        "system": "http://terminology.hl7.org/CodeSystem/v2-0203",
-                        "code": "SB",
-                        "display": "Social Beneficiary Identifier"
-                    }]
-                },
+                "type": _SB_IDENTIFIER_TYPE,
                 "value": national_id
-            })
+            } if national_id and national_id != primary_id else None,
+        ) if identifier]
         
         if identifiers:
             fhir_data["identifier"] = identifiers
         
         # === NAME - Fixed structure ===
-        names = []
         given_name = self.get_encrypted_field('given_name')
         family_name = self.get_encrypted_field('family_name')
         middle_name = self.get_encrypted_field('middle_name')
@@ -361,11 +406,7 @@ class Patient(models.Model):
                 name_data["family"] = family_name
             
             # Given names array
-            given_names = []
-            if given_name:
-                given_names.append(given_name)
-            if middle_name:
-                given_names.append(middle_name)
+            given_names = [name for name in (given_name, middle_name) if name]
             if given_names:
                 name_data["given"] = given_names
             
@@ -377,27 +418,24 @@ class Patient(models.Model):
             if name_suffix:
                 name_data["suffix"] = [name_suffix]
             
-            names.append(name_data)
+            fhir_data["name"] = [name_data]
             
         elif legacy_name:
             # Handle legacy name field
-            name_parts = legacy_name.strip().split()
-            if name_parts:
+            head, _, last = legacy_name.strip().rpartition(' ')
+            if last:
                 name_data = {"use": "official"}
                 
-                if len(name_parts) == 1:
+                if not head:
                     # Single name - use as both given and family
-                    name_data["family"] = name_parts[0]
-                    name_data["given"] = [name_parts[0]]
+                    name_data["family"] = last
+                    name_data["given"] = [last]
                 else:
                     # Multiple parts - last is family, rest are given
-                    name_data["family"] = name_parts[-1]
-                    name_data["given"] = name_parts[:-1]
+                    name_data["family"] = last
+                    name_data["given"] = head.split()
                 
-                names.append(name_data)
-        
-        if names:
-            fhir_data["name"] = names
+                fhir_data["name"] = [name_data]
         
         # === GENDER ===
         if self.gender and self.gender != "unknown":
@@ -408,37 +446,17 @@ class Patient(models.Model):
             fhir_data["birthDate"] = self.birth_date.isoformat()
         
         # === TELECOM - Fixed structure ===
-        telecom = []
-        primary_phone = self.get_encrypted_field('primary_phone')
-        secondary_phone = self.get_encrypted_field('secondary_phone')
-        email = self.get_encrypted_field('email')
-        
-        if primary_phone:
-            telecom.append({
-                "system": "phone",
-                "value": primary_phone,
-                "use": "home"
-            })
-        
-        if secondary_phone:
-            telecom.append({
-                "system": "phone", 
-                "value": secondary_phone,
-                "use": "work"
-            })
-        
-        if email:
-            telecom.append({
-                "system": "email",
-                "value": email,
-                "use": "home"
-            })
+        telecom = [
+            {**template, "value": value}
+            for field, template in _TELECOM_SPEC
+            for value in (self.get_encrypted_field(field),)
+            if value
+        ]
         
         if telecom:
             fhir_data["telecom"] = telecom
         
         # === ADDRESS - Fixed structure ===
-        addresses = []
         address_line1 = self.get_encrypted_field('address_line1')
         address_line2 = self.get_encrypted_field('address_line2')
         city = self.get_encrypted_field('city')
@@ -446,7 +464,7 @@ class Patient(models.Model):
         postal_code = self.get_encrypted_field('postal_code')
         
         # Only create address if we have meaningful data
-        if any([address_line1, address_line2, city, state_province, postal_code]):
+        if address_line1 or address_line2 or city or state_province or postal_code:
             address_data = {
                 "use": "home",
                 "type": "physical",
@@ -454,11 +472,7 @@ class Patient(models.Model):
             }
             
             # Address lines array
-            lines = []
-            if address_line1:
-                lines.append(address_line1)
-            if address_line2:
-                lines.append(address_line2)
+            lines = [line for line in (address_line1, address_line2) if line]
             if lines:
                 address_data["line"] = lines
             
@@ -472,28 +486,20 @@ class Patient(models.Model):
             if self.country:
                 address_data["country"] = self.country
             
-            addresses.append(address_data)
-        
-        if addresses:
-            fhir_data["address"] = addresses
+            fhir_data["address"] = [address_data]
         
         # === MARITAL STATUS ===
         if self.marital_status and self.marital_status != "unknown":
-            marital_status_codes = {
-                "single": "S",
-                "married": "M", 
-                "divorced": "D",
-                "widowed": "W",
-                "separated": "L"
-            }
-            code = marital_status_codes.get(self.marital_status, self.marital_status)
-            fhir_data["maritalStatus"] = {
-                "coding": [{
-                    "system": "http://terminology.hl7.org/CodeSystem/v3-MaritalStatus",
-                    "code": code,
-                    "display": self.marital_status.title()
-                }]
-            }
+            marital_status = _MARITAL_STATUS_CONCEPTS.get(self.marital_status)
+            if marital_status is None:
+                marital_status = {
+                    "coding": [{
+                        "system": "http://terminology.hl7.org/CodeSystem/v3-MaritalStatus",
+                        "code": self.marital_status,
+                        "display": self.marital_status.title()
+                    }]
+                }
+            fhir_data["maritalStatus"] = marital_status
         
         # === DECEASED STATUS ===
         if self.deceased:
@@ -503,37 +509,24 @@ class Patient(models.Model):
                 fhir_data["deceasedBoolean"] = True
         
         # === EXTENSIONS ===
-        extensions = []
-        
-        # Last arrived extension
-        if self.last_arrived:
-            extensions.append({
-                "url": "http://example.org/fhir/StructureDefinition/last-arrived",
-                "valueDate": self.last_arrived.isoformat()
-            })
-        
-        # Blood type extension
-        blood_type = self.get_encrypted_field('blood_type')
-        if blood_type:
-            extensions.append({
-                "url": "http://example.org/fhir/StructureDefinition/blood-type",
-                "valueString": blood_type
-            })
-        
-        # Allergies extension
-        allergies = self.get_encrypted_field('allergies')
-        if allergies:
-            extensions.append({
-                "url": "http://example.org/fhir/StructureDefinition/allergies",
-                "valueString": allergies
-            })
+        # Most patients have none, so the list is only created for the first one
+        extensions = None
+        
+        # Last arrived, blood type and allergies
+        for field, value_key, formatter, url in _EXTENSION_SPEC:
+            value = self.get_encrypted_field(field)
+            if value:
+                extensions = _add_extension(extensions, {
+                    "url": url,
+                    value_key: formatter(value) if formatter else value
+                })
         
         # Emergency contact extension
         emergency_contact_name = self.get_encrypted_field('emergency_contact_name')
         emergency_contact_phone = self.get_encrypted_field('emergency_contact_phone')
         emergency_contact_relationship = self.get_encrypted_field('emergency_contact_relationship')
         
-        if any([emergency_contact_name, emergency_contact_phone, emergency_contact_relationship]):
+        if emergency_contact_name or emergency_contact_phone or emergency_contact_relationship:
             emergency_contact = {}
             if emergency_contact_name:
                 emergency_contact["name"] = emergency_contact_name
@@ -542,14 +535,14 @@ class Patient(models.Model):
             if emergency_contact_relationship:
                 emergency_contact["relationship"] = emergency_contact_relationship
             
-            extensions.append({
+            extensions = _add_extension(extensions, {
                 "url": "http://example.org/fhir/StructureDefinition/emergency-contact",
                 "valueString": str(emergency_contact)  # Convert to string for FHIR
             })
         
         # Preferred language extension
         if self.preferred_language and self.preferred_language != "en":
-            extensions.append({
+            extensions = _add_extension(extensions, {
                 "url": "http://example.org/fhir/StructureDefinition/preferred-language",
                 "valueCode": self.preferred_language
             })
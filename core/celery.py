@@ -185,6 +185,10 @@ app.conf.beat_schedule = {
         'task': 'Fsync.maintenanceUtils.cleanup_stuck_processing_items',
         'schedule': crontab(minute='*/15'),  # Every 15 minutes
     },
+    'ensure-synclog-partitions': {
+        'task': 'Fsync.maintenanceUtils.ensure_synclog_partitions',
+        'schedule': crontab(minute=30, hour=0),  # Daily at 00:30
+    },
 }
 
 
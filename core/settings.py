@@ -108,6 +108,13 @@ CKEDITOR_5_CONFIGS = {
 # FHIR SERVER BASE URL
 FHIR_SERVER_BASE_URL = "http://172.17.0.1:8080/fhir"
 
+# FHIR sync queue polling (used by `manage.py sync_fhir --action worker`)
+# The worker polls at the minimum interval while there is work and backs off
+# by the given factor up to the maximum interval while the queue is empty.
+FHIR_SYNC_POLL_MIN_INTERVAL = float(os.environ.get('FHIR_SYNC_POLL_MIN_INTERVAL', '0.1'))
+FHIR_SYNC_POLL_MAX_INTERVAL = float(os.environ.get('FHIR_SYNC_POLL_MAX_INTERVAL', '60'))
+FHIR_SYNC_POLL_BACKOFF_FACTOR = float(os.environ.get('FHIR_SYNC_POLL_BACKOFF_FACTOR', '2'))
+
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',